@@ -2,17 +2,35 @@
 # Graphic Server Protocol (GSP) — reference implementation
 # Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
 # -----------------------------------------------------------------------------
+import sys
+import lzma
+import time
+import zlib
 import yaml
-import base64
+import struct
+import weakref
+import threading
 import itertools
 import numpy as np
+from typing import Union
 from datetime import datetime
 from functools import wraps
 
+# Use the (much faster) libyaml loader when available
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+Loaders = list({yaml.SafeLoader, Loader})
 
-def command(method=None, record=None, output=None):
+
+def command(method=None, record=None, output=None, coalesce=None, request=False):
     """Function decorator that create a command and optionally record it and write it
-    to stdout. """
+    to stdout.
+
+    When commands are buffered, coalesce tells how the command can be merged
+    with previous ones on the same object: "replace" for setters that override
+    any previous call, "range" for (offset, data) writes that can be merged.
+
+    Requests (request=True) return a value and do not modify any state: they
+    are not part of a compacted log. """
 
     def wrapper(func):
 
@@ -21,7 +39,7 @@ def command(method=None, record=None, output=None):
             keys = func.__code__.co_varnames[1:]
             values = args
             
-            func(self, *args, **kwargs)
+            result = func(self, *args, **kwargs)
 
             # Create command
             parameters = {"id": self.id}
@@ -30,28 +48,76 @@ def command(method=None, record=None, output=None):
             classname = self.__class__.__name__
             methodname = func.__code__.co_name if method is None else method
             name = "%s/%s" % (classname, methodname) if methodname else classname
-            command = Command.write(self, name, parameters)
-            
-            if record or Command.record:
-                Command.commands.append(command)
-                
-            if output or Command.output:
-                print(command)
-                
+
+            if Command.buffered:
+                # Buffered commands must not see later changes of mutable buffers
+                for key, value in parameters.items():
+                    if isinstance(value, (bytearray, memoryview, np.ndarray)):
+                        parameters[key] = bytes(_buffer(value))
+                Command.buffer.append((self, name, parameters, record, output, coalesce))
+            else:
+                Command.send(self, name, parameters, record, output, coalesce)
+            return result
+
+        inner.method = func.__code__.co_name if method is None else method
+        if request:
+            Command.requests.add(inner.method)
         return inner
     return wrapper
 
 
+class Session:
+    """ Identifier namespace.
+
+    Identifiers of session n are (n << Session.bits) + i where i is a local
+    index starting at 1, such that clients using different sessions never
+    produce the same identifiers. Local indices are reserved by blocks, per
+    thread, such that threads of a same session do not contend on a shared
+    counter. Session 0 produces the same identifiers as a plain counter. """
+
+    bits = 40
+    default = None
+    sessions = {}
+    local = threading.local()
+
+    def __init__(self, id=0, block=1024):
+        if not 0 <= id < 2**(64-Session.bits):
+            raise ValueError(f"Invalid session id {id}")
+        self.id = id
+        self.block = block
+        self.blocks = { "CID": itertools.count(), "OID": itertools.count() }
+        self.ranges = threading.local()
+
+    def next(self, kind):
+        """ Return the next identifier of the given kind (CID or OID) """
+
+        ids = getattr(self.ranges, kind, None)
+        id = next(ids, None) if ids is not None else None
+        if id is None:
+            start = 1 + next(self.blocks[kind]) * self.block
+            ids = iter(range(start, start + self.block))
+            setattr(self.ranges, kind, ids)
+            id = next(ids)
+        return (self.id << Session.bits) + id
+
+    @classmethod
+    def current(cls):
+        """ Session of the calling thread """
+
+        return getattr(cls.local, "session", cls.default)
+
+Session.default = Session.sessions[0] = Session(0)
+
+
 class CID(yaml.YAMLObject):
     """ Command identifier """
     
     yaml_tag = "!CID"
-    yaml_loader = yaml.SafeLoader
-    counter = itertools.count()
+    yaml_loader = Loaders
 
     def __init__(self, id=None):
         if id is None:
-            self.id = 1 + next(CID.counter)
+            self.id = Session.current().next("CID")
         else:
             self.id = int(id)
 
@@ -77,12 +143,11 @@ class OID(yaml.YAMLObject):
     """ Object identifier """
     
     yaml_tag = "!OID"
-    yaml_loader = yaml.SafeLoader
-    counter = itertools.count()
+    yaml_loader = Loaders
 
     def __init__(self, id=None):
         if id is None:
-            self.id = 1 + next(OID.counter)
+            self.id = Session.current().next("OID")
         else:
             self.id = int(id)
 
@@ -110,11 +175,61 @@ class Object:
     record = True
     objects = {}
 
+    # Objects referencing a given object id. Dependents are weakly referenced
+    # such that this index never keeps an object alive.
+    dependents = {}
+
+    # Registries of object subclasses (e.g. array content hashes), cleared
+    # along with the objects on reset
+    registries = []
+
     def __init__(self):
         self.id = OID()
         if Object.record:
             Object.objects[self.id] = self
 
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        # Private attributes (e.g. versions and caches) never reference objects
+        if name[0] == "_":
+            return
+        for item in value if isinstance(value, (list, tuple)) else (value,):
+            if isinstance(item, Object):
+                dependents = Object.dependents.setdefault(item.id, weakref.WeakValueDictionary())
+                dependents[id(self)] = self
+
+    @command("destroy")
+    def destroy(self):
+        self.release()
+
+    # Convenience method, not part of the protocol
+    def release(self):
+        """ Remove the object, and the objects that depend on it, from the
+        registry. """
+
+        Object.objects.pop(self.id, None)
+        for item in self.references():
+            Object.dependents.get(item.id, {}).pop(id(self), None)
+        for dependent in list(Object.dependents.pop(self.id, {}).values()):
+            dependent.release()
+
+    # Convenience method, not part of the protocol
+    def references(self):
+        """ Objects referenced by this object """
+
+        items = []
+        for value in vars(self).values():
+            items.extend(value if isinstance(value, (list, tuple)) else (value,))
+        return [item for item in items if isinstance(item, Object)]
+
+    # Convenience method, not part of the protocol
+    def nbytes(self):
+        """ Number of bytes held by the object buffers """
+
+        return sum(len(value) if isinstance(value, (bytes, bytearray)) else value.nbytes
+                   for value in vars(self).values()
+                   if isinstance(value, (np.ndarray, bytes, bytearray, memoryview)))
+
     def __eq__(self, other):
         if not type(self) == type(other):
             return False
@@ -125,11 +240,237 @@ class Object:
                 return False
         return True
 
+# Method opcodes for the binary format. New methods must be appended at the
+# end such that existing opcodes remain stable. Opcode 0 is reserved for
+# methods that are not in this table (the method name is then sent in full).
+METHODS = [ "Datatype",
+            "Array", "Array/set_data",
+            "ArrayView",
+            "ArraySlice",
+            "Canvas", "Canvas/set_size", "Canvas/set_dpi", "Canvas/set_dpr",
+            "Viewport", "Viewport/set_position", "Viewport/set_size",
+            "TransformMatrix", "TransformMatrix/set_data",
+            "TransformColormap",
+            "Unit",
+            "Datatype/destroy", "Array/destroy", "ArrayView/destroy",
+            "ArraySlice/destroy", "Canvas/destroy", "Viewport/destroy",
+            "TransformMatrix/destroy", "TransformColormap/destroy",
+            "Array/get_data",
+            "SharedArray", "SharedArray/notify", "SharedArray/get_data",
+            "SharedArray/destroy",
+            "Array/set_delta",
+            "RingArray", "RingArray/append", "RingArray/set_data",
+            "RingArray/set_delta", "RingArray/get_data", "RingArray/destroy",
+            "Viewport/pick", "Viewport/select", "Viewport/lasso",
+            "TransformChain", "TransformChain/destroy" ]
+OPCODES = { method: opcode for opcode, method in enumerate(METHODS, 1) }
+
+# Binary frame layout (little endian):
+#
+#   magic (4 bytes) | header size (u32) | payloads size (u64) | header
+#   | payload 1 | payload 2 | ...
+#
+#   header    = opcode (u16) | count (u16) | command id (u64) | object id (u64)
+#               | timestamp (f64) | [method (str) if opcode is 0] | parameters
+#   parameter = key size (u8) | key | value
+#   value     = tag (1 byte) | content
+#
+# Bytes values are not stored in the header: only their size is, and their
+# content is appended as is, in order, after the header.
+MAGIC = b"GSP\x01"
+PREFIX = struct.Struct("<4sIQ")
+HEADER = struct.Struct("<HHQQd")
+
+# Buffer parameters may be any object supporting the buffer protocol
+Bytes = Union[bytes, bytearray, memoryview, np.ndarray]
+
+
+def _buffer(value):
+    """ Flat unsigned byte view of a buffer (no copy if it is contiguous) """
+
+    if isinstance(value, np.ndarray):
+        return np.ascontiguousarray(value).reshape(-1).view(np.uint8).data
+    return memoryview(value).cast("B")
+
+
+# Compression codecs of buffer parameters: name -> (id, compress, decompress)
+CODECS = { "zlib" : (1, zlib.compress, zlib.decompress),
+           "lzma" : (2, lzma.compress, lzma.decompress) }
+CODEC_NAMES = { id: name for name, (id, _, _) in CODECS.items() }
+
+
+class Compressed(yaml.YAMLObject):
+    """ Compressed buffer, decompressed when read """
+
+    yaml_tag = "!Compressed"
+    yaml_loader = Loaders
+
+    def __init__(self, codec, size, data):
+        self.codec = codec
+        self.size = size
+        self.data = data
+
+    def decompress(self):
+        start = time.perf_counter()
+        data = CODECS[self.codec][2](self.data)
+        if len(data) != self.size:
+            raise ValueError("Corrupted compressed buffer")
+        Compression.stats["decoded"] += 1
+        Compression.stats["decode_time"] += time.perf_counter() - start
+        return data
+
+    @classmethod
+    def to_yaml(cls, representer, node):
+        return representer.represent_mapping(cls.yaml_tag, vars(node))
+
+    @classmethod
+    def from_yaml(cls, loader, node):
+        return cls(**loader.construct_mapping(node, deep=True)).decompress()
+
+
+class Compression:
+    """ Compression of buffer parameters.
+
+    Buffers smaller than threshold bytes are sent as is. For larger ones, a
+    sample of the buffer is compressed first and the buffer is only
+    compressed if the sample ratio (compressed / raw size) is under ratio.
+    The buffer is finally sent as is if the actual ratio is above ratio. """
+
+    # Statistics (of all compressions and decompressions)
+    stats = { "compressed" : 0, "skipped" : 0, "decoded" : 0,
+              "raw_bytes" : 0, "compressed_bytes" : 0,
+              "encode_time" : 0.0, "decode_time" : 0.0 }
+
+    def __init__(self, codec="zlib", threshold=65536, ratio=0.75, sample=65536, level=1):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec '{codec}'")
+        self.codec = codec
+        self.threshold = threshold
+        self.ratio = ratio
+        self.sample = sample
+        self.level = level
+
+    def compress(self, value):
+        """ Return a Compressed version of value or value if not worth it """
+
+        buffer = _buffer(value)
+        if buffer.nbytes < self.threshold:
+            return value
+        stats = Compression.stats
+        start = time.perf_counter()
+        compress = CODECS[self.codec][1]
+        options = { "level": self.level } if self.codec == "zlib" else { "preset": self.level }
+        if buffer.nbytes > 2*self.sample:
+            sample = buffer[:self.sample]
+            if len(compress(sample, **options)) > self.ratio*sample.nbytes:
+                stats["skipped"] += 1
+                stats["encode_time"] += time.perf_counter() - start
+                return value
+        data = compress(buffer, **options)
+        stats["encode_time"] += time.perf_counter() - start
+        if len(data) > self.ratio*buffer.nbytes:
+            stats["skipped"] += 1
+            return value
+        stats["compressed"] += 1
+        stats["raw_bytes"] += buffer.nbytes
+        stats["compressed_bytes"] += len(data)
+        return Compressed(self.codec, buffer.nbytes, data)
+
+
+def _pack(value, header, payloads):
+    """ Append the binary encoding of value to header (and payloads). """
+
+    if value is None:
+        header.append(b"N")
+    elif isinstance(value, bool):
+        header.append(struct.pack("<c?", b"?", value))
+    elif isinstance(value, (int, np.integer)):
+        header.append(struct.pack("<cq", b"i", value))
+    elif isinstance(value, (float, np.floating)):
+        header.append(struct.pack("<cd", b"f", value))
+    elif isinstance(value, str):
+        value = value.encode()
+        header.append(struct.pack("<cI", b"s", len(value)))
+        header.append(value)
+    elif isinstance(value, OID):
+        header.append(struct.pack("<cQ", b"o", value.id))
+    elif isinstance(value, (list, tuple)):
+        header.append(struct.pack("<cI", b"l", len(value)))
+        for item in value:
+            _pack(item, header, payloads)
+    elif isinstance(value, np.ndarray) and value.dtype.names is None:
+        header.append(b"a")
+        _pack(value.dtype.str, header, payloads)
+        _pack(list(value.shape), header, payloads)
+        header.append(struct.pack("<Q", value.nbytes))
+        payloads.append(_buffer(value))
+    elif isinstance(value, (bytes, bytearray, memoryview, np.ndarray)):
+        value = _buffer(value)
+        header.append(struct.pack("<cQ", b"b", value.nbytes))
+        payloads.append(value)
+    elif isinstance(value, Compressed):
+        header.append(struct.pack("<cBQQ", b"z", CODECS[value.codec][0],
+                                  value.size, len(value.data)))
+        payloads.append(value.data)
+    else:
+        raise ValueError(f"Cannot encode {type(value).__name__} value")
+
+def _unpack(frame, offset, cursor):
+    """ Decode a value from frame at offset (payloads start at cursor) and
+    return the value and the new offset and cursor. """
+
+    tag = frame[offset:offset+1]
+    offset += 1
+    if tag == b"N":
+        return None, offset, cursor
+    elif tag == b"?":
+        return frame[offset] != 0, offset+1, cursor
+    elif tag == b"i":
+        return struct.unpack_from("<q", frame, offset)[0], offset+8, cursor
+    elif tag == b"f":
+        return struct.unpack_from("<d", frame, offset)[0], offset+8, cursor
+    elif tag == b"s":
+        size, = struct.unpack_from("<I", frame, offset)
+        offset += 4
+        return bytes(frame[offset:offset+size]).decode(), offset+size, cursor
+    elif tag == b"o":
+        return OID(struct.unpack_from("<Q", frame, offset)[0]), offset+8, cursor
+    elif tag == b"l":
+        count, = struct.unpack_from("<I", frame, offset)
+        offset += 4
+        value = []
+        for i in range(count):
+            item, offset, cursor = _unpack(frame, offset, cursor)
+            value.append(item)
+        return value, offset, cursor
+    elif tag == b"b":
+        size, = struct.unpack_from("<Q", frame, offset)
+        return memoryview(frame)[cursor:cursor+size], offset+8, cursor+size
+    elif tag == b"a":
+        dtype, offset, cursor = _unpack(frame, offset, cursor)
+        shape, offset, cursor = _unpack(frame, offset, cursor)
+        size, = struct.unpack_from("<Q", frame, offset)
+        value = np.frombuffer(memoryview(frame)[cursor:cursor+size], dtype=dtype).reshape(shape)
+        return value, offset+8, cursor+size
+    elif tag == b"z":
+        codec, size, length = struct.unpack_from("<BQQ", frame, offset)
+        value = Compressed(CODEC_NAMES[codec], size, memoryview(frame)[cursor:cursor+length])
+        return value.decompress(), offset+17, cursor+length
+    raise ValueError(f"Unknown tag {tag!r} in binary command")
+
+
 class Command:
 
     record = True
     output = True
+    format = "yaml"
     commands = []
+    buffered = False
+    buffer = []
+    writer = None
+    compression = None   # Compression of buffer parameters (see Compression)
+    requests = set()     # Names of request methods (see command)
+    chunk = None         # Maximum payload size of (offset, data) writes
 
     # Convenience method, not part of the protocol
     @classmethod
@@ -145,9 +486,130 @@ class Command:
             return False
         return not l2
     
+    @classmethod
+    def send(cls, self, method, parameters, record=None, output=None, coalesce=None):
+        """ Write a command and record it and/or output it. Large "range"
+        writes are split in chunks (see split). """
+
+        if not (record or cls.record or output or cls.output):
+            return
+        if coalesce == "range" and cls.chunk:
+            for chunk in cls.split(self, parameters):
+                cls.send(self, method, chunk, record, output)
+            return
+        command = cls.write(self, method, parameters)
+
+        if record or cls.record:
+            cls.commands.append(command)
+
+        if output or cls.output:
+            if cls.writer is not None:
+                cls.writer.write(command)
+            elif isinstance(command, bytes):
+                sys.stdout.buffer.write(command)
+                sys.stdout.flush()
+            else:
+                print(command)
+
+    @classmethod
+    def flush(cls):
+        """ Coalesce and write buffered commands.
+
+        Consecutive calls to a "replace" setter on an object are collapsed to
+        the last one, and consecutive "range" writes on an object are merged
+        when they overlap or are adjacent. Coalescing never crosses a request
+        or another command on the same object (or referencing it), such that
+        commands are never reordered. Return the number of commands and of
+        payload bytes that have been removed. """
+
+        buffer, cls.buffer = cls.buffer, []
+        entries = [[entry] for entry in buffer]
+
+        setters = {}   # object id -> (method, index) of a last command that is a setter
+        writes = {}    # object id -> indices of the current run of writes
+        runs = []
+        for index, (self, name, parameters, _, _, coalesce) in enumerate(buffer):
+            if name.partition("/")[2] in cls.requests:
+                runs.extend(writes.values())
+                writes.clear()
+                setters.clear()
+                continue
+            if coalesce == "range":
+                writes.setdefault(self.id, []).append(index)
+                setters.pop(self.id, None)
+                continue
+            targets = [self.id]
+            for value in parameters.values():
+                for item in value if isinstance(value, (list, tuple)) else (value,):
+                    if isinstance(item, (Object, OID)):
+                        targets.append(item.id if isinstance(item, Object) else item)
+            for target in targets:
+                if target in writes:
+                    runs.append(writes.pop(target))
+            previous = setters.pop(self.id, None)
+            for target in targets[1:]:
+                setters.pop(target, None)
+            if coalesce == "replace":
+                if previous is not None and previous[0] == name:
+                    entries[previous[1]] = []
+                setters[self.id] = (name, index)
+        runs.extend(writes.values())
+
+        for run in runs:
+            if len(run) < 2:
+                continue
+            self, name, _, record, output, _ = buffer[run[-1]]
+            itemsize = self._array.dtype.itemsize
+            segments = []
+            for index in run:
+                offset, data = buffer[index][2]["offset"], buffer[index][2]["data"]
+                start, stop = offset, offset + len(data) // itemsize
+                merged = [s for s in segments if s[0] <= stop and start <= s[1]]
+                if merged:
+                    lo = min([start] + [s[0] for s in merged])
+                    hi = max([stop] + [s[1] for s in merged])
+                    segment = [lo, hi, bytearray((hi-lo)*itemsize)]
+                    for s in merged + [[start, stop, data]]:
+                        segment[2][(s[0]-lo)*itemsize:(s[1]-lo)*itemsize] = s[2]
+                    segments = [s for s in segments if not any(s is m for m in merged)]
+                    segments.append(segment)
+                else:
+                    segments.append([start, stop, data])
+                entries[index] = []
+            entries[run[-1]] = [(self, name,
+                                 {"id": self.id, "offset": start, "data": bytes(data)},
+                                 record, output, "range")
+                                for start, stop, data in sorted(segments, key=lambda s: s[0])]
+
+        size = lambda entry: sum(len(value) for value in entry[2].values()
+                                            if isinstance(value, bytes))
+        count = 0
+        nbytes = sum(size(entry) for entry in buffer)
+        for entry in (entry for items in entries for entry in items):
+            self, name, parameters, record, output, coalesce = entry
+            cls.send(self, name, parameters, record, output, coalesce)
+            nbytes -= size(entry)
+            count += 1
+        return len(buffer) - count, nbytes
+
+    @classmethod
+    def split(cls, self, parameters):
+        """ Split an (offset, data) write into writes of at most cls.chunk
+        bytes (whole items) that can be applied as they arrive. """
+
+        data = _buffer(parameters["data"])
+        itemsize = self._array.dtype.itemsize
+        step = max(1, cls.chunk // itemsize) * itemsize
+        if data.nbytes <= step:
+            return [parameters]
+        return [ { **parameters, "offset": parameters["offset"] + start // itemsize,
+                                 "data": data[start:start+step] }
+                 for start in range(0, data.nbytes, step) ]
+
     @classmethod
     def write(cls, self, method, parameters):
-        """ Dump the given method and paramters as a yaml block. """
+        """ Dump the given method and paramters as a yaml block (or as a
+        binary frame if format is "binary"). """
         
         command_id = CID()
         timestamp = datetime.timestamp( datetime.now())
@@ -156,6 +618,21 @@ class Command:
         for key, value in parameters.items():
             if isinstance(value, Object):
                 parameters[key] = value.id
+            elif isinstance(value, (list, tuple)) and any(isinstance(item, Object) for item in value):
+                parameters[key] = [item.id if isinstance(item, Object) else item for item in value]
+
+        if cls.compression is not None:
+            for key, value in parameters.items():
+                if isinstance(value, (bytes, bytearray, memoryview, np.ndarray)):
+                    parameters[key] = cls.compression.compress(value)
+
+        if cls.format == "binary":
+            return cls.write_binary(method, command_id, timestamp, parameters)
+
+        # yaml only knows about bytes
+        for key, value in parameters.items():
+            if isinstance(value, (bytearray, memoryview, np.ndarray)):
+                parameters[key] = bytes(_buffer(value))
         
         data = [ { "method" : method,
                    "id" : command_id,
@@ -163,11 +640,68 @@ class Command:
                    "parameters" : parameters } ]
         return yaml.dump(data, default_flow_style=None, sort_keys=False)
 
+    @classmethod
+    def write_binary(cls, method, command_id, timestamp, parameters):
+        """ Encode the given method and parameters as a binary frame. """
+
+        opcode = OPCODES.get(method, 0)
+        header, payloads = [], []
+        if not opcode:
+            _pack(method, header, payloads)
+        count = 0
+        for key, value in parameters.items():
+            if key == "id":
+                continue
+            key = key.encode()
+            header.append(struct.pack("<B", len(key)))
+            header.append(key)
+            _pack(value, header, payloads)
+            count += 1
+        header.insert(0, HEADER.pack(opcode, count, command_id.id,
+                                     parameters["id"].id, timestamp))
+        header = b"".join(header)
+        prefix = PREFIX.pack(MAGIC, len(header), sum(len(p) for p in payloads))
+        return b"".join([prefix, header] + payloads)
+
+    @classmethod
+    def read_binary(cls, frame):
+        """ Decode a binary frame into a command (same layout as yaml). """
+
+        magic, size, _ = PREFIX.unpack_from(frame)
+        if magic != MAGIC:
+            raise ValueError("Not a binary GSP command")
+        opcode, count, command_id, object_id, timestamp = HEADER.unpack_from(frame, PREFIX.size)
+        offset, cursor = PREFIX.size + HEADER.size, PREFIX.size + size
+        if opcode:
+            method = METHODS[opcode-1]
+        else:
+            method, offset, cursor = _unpack(frame, offset, cursor)
+        parameters = { "id": OID(object_id) }
+        for i in range(count):
+            length = frame[offset]
+            key = bytes(frame[offset+1:offset+1+length]).decode()
+            parameters[key], offset, cursor = _unpack(frame, offset+1+length, cursor)
+        return { "method" : method,
+                 "id" : CID(command_id),
+                 "timestamp" : timestamp,
+                 "parameters" : parameters }
+
+    @classmethod
+    def read(cls, command):
+        """ Decode a command, whatever its format. """
+
+        if isinstance(command, (bytes, bytearray, memoryview)):
+            if bytes(command[:len(MAGIC)]) == MAGIC:
+                return cls.read_binary(command)
+            command = bytes(command).decode()
+        return yaml.load(command, Loader=Loader)[0]
+
     @classmethod
     def process(cls, command, globals=None, locals=None):
-        """ Process a yaml command and create or update the corresponding object. """
+        """ Process a yaml (or binary) command and create or update the
+        corresponding object. """
         
-        data = yaml.safe_load(command)[0]
+        data = cls.read(command)
         try:
             classname, method = data["method"].split("/")
         except ValueError:
@@ -180,20 +714,64 @@ class Command:
         for key, value in parameters.items():
             if isinstance(value, OID):
                 parameters[key] = Object.objects[value]
+            elif isinstance(value, list):
+                parameters[key] = [Object.objects[item] if isinstance(item, OID) else item
+                                   for item in value]
 
         if method is None:
             object = globals[classname](**parameters)
             object.id = object_id
             Object.objects[object_id] = object
         else:
-            getattr(globals[classname], method)(Object.objects[object_id], **parameters)
-
-
-def mode(mode="server", reset=True, record=None, output=None):
-    "Set protocol in specified mode (server or client)."
-
+            return getattr(globals[classname], method)(Object.objects[object_id], **parameters)
+
+
+def encode(value):
+    """ Binary encoding of a single value (e.g. the result of a request). """
+
+    header, payloads = [], []
+    _pack(value, header, payloads)
+    header = b"".join(header)
+    return b"".join([struct.pack("<I", len(header)), header] + payloads)
+
+def decode(buffer):
+    """ Decode a value encoded with encode. """
+
+    size, = struct.unpack_from("<I", buffer)
+    return _unpack(buffer, 4, 4 + size)[0]
+
+
+# Default value of mode parameters for which None is meaningful
+UNCHANGED = object()
+
+def mode(mode="server", reset=True, record=None, output=None, format=None,
+         buffered=None, writer=UNCHANGED, compression=None, chunk=None):
+    """Set protocol in specified mode (server or client). If a writer is given
+    (see writer.Writer), output commands are sent to it instead of stdout
+    (None to detach it).
+    Compression (a codec name or a Compression, False to disable) applies to
+    large buffer parameters and chunk (in bytes, 0 to disable) splits large
+    Array writes."""
+
+    if format is not None:
+        if format not in ("yaml", "binary"):
+            raise ValueError(f"Unknown command format '{format}'")
+        Command.format = format
+    if buffered is not None:
+        Command.buffered = buffered
+    if writer is not UNCHANGED:
+        Command.writer = writer
+    if compression is not None:
+        if isinstance(compression, str):
+            compression = Compression(compression)
+        Command.compression = compression or None
+    if chunk is not None:
+        Command.chunk = chunk or None
     if reset:
         Object.objects = {}
+        Object.dependents = {}
+        for registry in Object.registries:
+            registry.clear()
     if mode == "client":
         Command.record = record if record is not None else True
         Command.output = output if output is not None else True
@@ -203,11 +781,86 @@ def mode(mode="server", reset=True, record=None, output=None):
         Command.output = output if output is not None else False
         Object.record = False
 
+def session(session=None):
+    """ Set the session (a Session or a session id) of the calling thread and
+    return it. """
+
+    if session is not None:
+        if not isinstance(session, Session):
+            session = Session.sessions.setdefault(session, Session(session))
+        Session.local.session = session
+    return Session.current()
+
 def objects():
     return Object.objects
 
 def commands():
     return Command.commands
 
+def memory():
+    """ Bytes held per object type """
+
+    usage = {}
+    for object in Object.objects.values():
+        name = object.__class__.__name__
+        usage[name] = usage.get(name, 0) + object.nbytes()
+    return usage
+
+def flush():
+    return Command.flush()
+
+def compression(reset=False):
+    """ Compression statistics (ratio is compressed / raw size) """
+
+    stats = dict(Compression.stats)
+    stats["ratio"] = stats["compressed_bytes"] / max(stats["raw_bytes"], 1)
+    if reset:
+        for key in Compression.stats:
+            Compression.stats[key] = 0
+    return stats
+
 def process(command, globals=None, locals=None):
-    Command.process(command, globals, locals)
+    return Command.process(command, globals, locals)
+
+def iterframes(file, progress=None, interval=1000):
+    """ Yield binary frames one at a time from a file object. If given,
+    progress is called with a visp.Progress instance every interval frames
+    and at the end. """
+
+    import visp
+    state = visp.Progress()
+    while True:
+        prefix = file.read(PREFIX.size)
+        if not prefix:
+            break
+        if len(prefix) < PREFIX.size:
+            raise ValueError("Truncated frame prefix")
+        _, size, payload = PREFIX.unpack(prefix)
+        frame = prefix + file.read(size + payload)
+        if len(frame) < PREFIX.size + size + payload:
+            raise ValueError("Truncated frame")
+        state.bytes += len(frame)
+        yield frame
+        state.commands += 1
+        if progress and not state.commands % interval:
+            progress(state)
+    if progress:
+        progress(state)
+
+def process_stream(file, globals=None, locals=None, progress=None, interval=1000):
+    """ Process commands incrementally from a filename or a file object (e.g. a
+    pipe) holding yaml commands or binary frames. If given, progress is called
+    with a visp.Progress instance every interval commands and at the end. """
+
+    import visp
+    if isinstance(file, str):
+        with open(file, "rb") as f:
+            return process_stream(f, globals, locals, progress, interval)
+
+    peek = getattr(file, "peek", None)
+    if peek is not None and peek(len(MAGIC))[:len(MAGIC)] == MAGIC:
+        commands = iterframes(file, progress, interval)
+    else:
+        commands = visp.iterload(file, "yaml", True, progress, interval)
+    for command in commands:
+        Command.process(command, globals, locals)
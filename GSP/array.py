@@ -2,47 +2,296 @@
 # Graphic Server Protocol (GSP) — reference implementation
 # Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
 # -----------------------------------------------------------------------------
+import weakref
+import hashlib
 import numpy as np
 from typing import Union
-from GSP import OID, Object, command
+from GSP import OID, Object, Bytes, command, _buffer
 from typeguard import typechecked
 from datatype import Datatype
+from ranges import Ranges
 
 class Array(Object):
 
+    # Maximum number of dirty ranges kept per consumer
+    dirty_limit = 16
+
+    # Content hashes are computed by blocks of hash_block bytes such that
+    # only modified blocks need to be hashed again
+    hash_block = 65536
+
+    # Live arrays whose content hash is known: hash -> {id(array): array}
+    contents = {}
+
+    # Whether arrays created from data are hashed, such that they can be
+    # referenced by content hash (e.g. on a server of dedup clients)
+    dedup = False
+
     # Convenience method, not part of the protocol
     @classmethod
-    def from_numpy(cls, Z):
+    def from_numpy(cls, Z, dedup=False):
+        """ Create an array from Z. If dedup is True and an array with the
+        same content exists, the array is created from the content hash and
+        the content is not sent. """
+
         if (isinstance(Z, np.ndarray)):
-            datatype = Datatype.from_numpy(Z.dtype)
+            datatype = Datatype(Datatype.from_numpy(Z.dtype))
             shape = list(Z.shape)
-            data = Z.tobytes()
-            return Array(shape, datatype, data)
+            if dedup:
+                blocks = [None]*max(1, -(-Z.nbytes // cls.hash_block))
+                digest = cls.digest(Z, blocks)
+                if cls.find(digest) is not None:
+                    return Array(shape, datatype, digest)
+                array = Array(shape, datatype, Z)
+                array._blocks = blocks
+                array.hash()
+                return array
+            return Array(shape, datatype, Z)
         raise ValueError(f"Unknown type for {Z}, cannot convert to Array")
 
+    # Convenience method, not part of the protocol
+    @classmethod
+    def digest(cls, data, blocks=None):
+        """ Content hash of data (hash of the blake2 hashes of its blocks).
+        Blocks that are None in blocks (if given) are computed in place. """
+
+        data = _buffer(data)
+        size = cls.hash_block
+        count = max(1, (data.nbytes + size - 1) // size)
+        blocks = [None]*count if blocks is None else blocks
+        for i in range(count):
+            if blocks[i] is None:
+                blocks[i] = hashlib.blake2b(data[i*size:(i+1)*size], digest_size=16).digest()
+        return hashlib.blake2b(b"".join(blocks), digest_size=32).hexdigest()
+
+    # Convenience method, not part of the protocol
+    @classmethod
+    def find(cls, digest):
+        """ Return a live array whose content hash is digest, or None """
+
+        holders = cls.contents.get(digest)
+        if holders is None:
+            return None
+        for array in list(holders.values()):
+            if Object.objects.get(array.id) is array:
+                return array
+        # (holders may have been collected)
+        if not holders:
+            del cls.contents[digest]
+        return None
+
+    # Convenience method, not part of the protocol
+    @classmethod
+    def deduplicated(cls):
+        """ Number of arrays sharing their content with other arrays and
+        number of bytes saved """
+
+        count, nbytes = 0, 0
+        for holders in cls.contents.values():
+            buffers = {}
+            for array in holders.values():
+                address = array._array.__array_interface__["data"][0]
+                buffers.setdefault(address, []).append(array)
+            for arrays in buffers.values():
+                if len(arrays) > 1:
+                    count += len(arrays)
+                    nbytes += (len(arrays)-1) * arrays[0]._array.nbytes
+        return count, nbytes
+
     
     @typechecked
     @command("")
     def __init__(self, shape : Union[int,list],
                        datatype : Union[str,Datatype],
-                       data  : bytes):
+                       data  : Union[Bytes,str]):
         Object.__init__(self)
         self.shape = shape
         if isinstance(datatype, (Datatype,)):
             self.datatype = datatype
         else:
             self.datatype = Datatype(datatype)
-        self.data = data
         dtype = Datatype.to_numpy(self.datatype.datatype)
-        self._array = np.frombuffer(data, dtype=dtype).reshape(shape).copy()
+        self._version = 0
+        self._dirty = {}
+        self._hash = None
+        self._blocks = None
+        if isinstance(data, str):
+            # Content hash of an existing array
+            dtype = np.dtype(dtype)
+            source = Array.find(data)
+            if source is None:
+                raise ValueError(f"Unknown content {data}")
+            data = source._array
+            if data.dtype == dtype.base and data.shape == tuple(np.atleast_1d(shape)):
+                # Share (through a read only view) the content of source,
+                # the first of them being modified getting its own copy
+                self._array = data.view()
+                self._array.flags.writeable = False
+                self._hash, self._blocks = source._hash, list(source._blocks)
+                Array.contents[self._hash][id(self)] = self
+                return
+        # Single copy of data, whatever its type (bytewise such that padding
+        # bytes of structured datatypes are copied as well)
+        data = np.frombuffer(_buffer(data), dtype=dtype).reshape(shape)
+        self._array = np.empty_like(data)
+        self._array.reshape(-1).view(np.uint8)[...] = data.reshape(-1).view(np.uint8)
+        if Array.dedup:
+            self.hash()
 
     @typechecked
-    @command("set_data")
+    @command("set_data", coalesce="range")
     def set_data(self, offset : int,
-                       data   : bytes ):
-        size = len(data) // self._array.dtype.itemsize
-        data = np.frombuffer(data, dtype=self._array.dtype)
-        self._array.ravel()[offset:offset+size] = data
+                       data   : Bytes ):
+        self.own()
+        data = np.frombuffer(_buffer(data), dtype=self._array.dtype)
+        self._array.reshape(-1)[offset:offset+data.size] = data
+        self.touch(offset, offset+data.size)
+
+    @typechecked
+    @command("set_delta")
+    def set_delta(self, indices : Bytes,
+                        values  : Bytes ):
+        """ XOR the elements at indices (uint32) with values """
+
+        indices = np.frombuffer(_buffer(indices), dtype=np.uint32)
+        if len(indices) == 0:
+            return
+        self.own()
+        itemsize = self._array.dtype.itemsize
+        items = self._array.reshape(-1).view(np.uint8).reshape(-1, itemsize)
+        items[indices] ^= np.frombuffer(_buffer(values), dtype=np.uint8).reshape(-1, itemsize)
+        # Runs of consecutive indices
+        breaks = np.flatnonzero(np.diff(indices) != 1) + 1
+        starts = indices[np.concatenate([[0], breaks])].astype(np.int64)
+        stops = indices[np.concatenate([breaks-1, [len(indices)-1]])].astype(np.int64) + 1
+        self.touch(starts, stops)
+
+    # Convenience method, not part of the protocol
+    def update(self, Z):
+        """ Replace the content of the array with Z sending as few bytes as
+        possible: a sparse delta (see set_delta) for scattered changes, a
+        single write of the modified range or a full write otherwise. The
+        delta is computed against the current content, i.e. the state of
+        the server once the previous commands have been applied. """
+
+        itemsize = self._array.dtype.itemsize
+        old = self._array.reshape(-1)
+        new = np.ascontiguousarray(Z, dtype=self._array.dtype).reshape(-1)
+        # Bitwise comparison of elements (whatever their type)
+        kind = { 1: np.uint8, 2: np.uint16, 4: np.uint32, 8: np.uint64 }.get(
+            itemsize, np.dtype((np.void, itemsize)))
+        indices = np.flatnonzero(old.view(kind) != new.view(kind))
+        old = old.view(np.uint8).reshape(-1, itemsize)
+        new = new.view(np.uint8).reshape(-1, itemsize)
+        if not len(indices):
+            return
+        start, stop = indices[0], indices[-1]+1
+        if len(indices)*(4+itemsize) < (stop-start)*itemsize and len(old) <= 2**32:
+            self.set_delta(indices.astype(np.uint32), (old[indices] ^ new[indices]).reshape(-1))
+        else:
+            self.set_data(int(start), new[start:stop].reshape(-1))
+
+    @typechecked
+    @command("get_data", request=True)
+    def get_data(self, offset : int,
+                       count  : int) -> bytes:
+        return self._array.ravel()[offset:offset+count].tobytes()
+
+    # Convenience method, not part of the protocol
+    def touch(self, start, stop):
+        """ Mark the [start, stop) elements as modified (start and stop may
+        also be sorted arrays of disjoint ranges) """
+
+        self._version += 1
+        for ranges in self._dirty.values():
+            if np.ndim(start):
+                ranges.update(start, np.minimum(stop, self._array.size))
+            else:
+                ranges.add(start, min(stop, self._array.size))
+
+        # Content hash is not valid anymore and modified blocks are stale
+        self.unregister()
+        if self._blocks is not None:
+            itemsize, count = self._array.dtype.itemsize, len(self._blocks)
+            first = np.atleast_1d(start) * itemsize // self.hash_block
+            last = (np.maximum(np.atleast_1d(stop), 1) * itemsize - 1) // self.hash_block
+            stale = np.zeros(count+1, dtype=np.int64)
+            np.add.at(stale, np.minimum(first, count), 1)
+            np.add.at(stale, np.minimum(last+1, count), -1)
+            for i in np.flatnonzero(np.cumsum(stale[:count])).tolist():
+                self._blocks[i] = None
+
+    # Convenience method, not part of the protocol
+    def own(self):
+        """ Make the array writable, copying its content if it is shared
+        with other arrays (copy on write) """
+
+        holders = Array.contents.get(self._hash, {}) if self._hash is not None else {}
+        if any(array is not self and np.may_share_memory(array._array, self._array)
+               for array in list(holders.values())):
+            self._array = self._array.copy()
+        elif not self._array.flags.writeable:
+            self._array.flags.writeable = True
+
+    # Convenience method, not part of the protocol
+    def unregister(self):
+        """ Forget the content hash of the array """
+
+        if self._hash is not None:
+            holders = Array.contents.get(self._hash)
+            if holders is not None:
+                holders.pop(id(self), None)
+                if not holders:
+                    del Array.contents[self._hash]
+            self._hash = None
+
+    # Convenience method, not part of the protocol
+    def release(self):
+        self.unregister()
+        Object.release(self)
+
+    # Convenience method, not part of the protocol
+    def hash(self):
+        """ Content hash (cached, only modified blocks are hashed again) """
+
+        if self._hash is None:
+            if self._blocks is None:
+                self._blocks = [None]*max(1, -(-self._array.nbytes // self.hash_block))
+            self._hash = Array.digest(self._array, self._blocks)
+            holders = Array.contents.setdefault(self._hash, weakref.WeakValueDictionary())
+            holders[id(self)] = self
+        return self._hash
+
+    # Convenience method, not part of the protocol
+    def dirty(self, consumer, clear=True):
+        """ Return the version of the array and the (start, stop) element
+        ranges modified since the last call by consumer (e.g. a backend
+        buffer). Everything is dirty for a new consumer. """
+
+        ranges = self._dirty.get(consumer)
+        if ranges is None:
+            ranges = self._dirty[consumer] = Ranges(self.dirty_limit)
+            ranges.add(0, self._array.size)
+        return self._version, ranges.clear() if clear else list(ranges)
+
+    # Convenience method, not part of the protocol
+    def untrack(self, consumer):
+        """ Stop tracking modifications for consumer """
+
+        self._dirty.pop(consumer, None)
+
+    def __getstate__(self):
+        state = dict(vars(self))
+        for key in ("_dirty", "_hash", "_blocks"):
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+        self._dirty = {}
+        self._hash = None
+        self._blocks = None
 
     def __repr__(self):
         return f"Array [id={self.id}]: {tuple(self.shape)}, {self.datatype}, {self._array}"
@@ -55,7 +304,19 @@ class Array(Object):
             return False
         return True
 
+    # Convenience method, not part of the protocol
+    def same_content(self, other):
+        """ Whether other has the same content, compared by content hash
+        (the content hashes of both arrays being registered) """
+
+        return self.hash() == other.hash()
+
     # Convenience method, not part of the protocol
     def __getitem__(self, key):
-        import array_view
+        import array_view, array_slice, view
+        if isinstance(key, slice):
+            start, stop, step = key.indices(view.View.length(self))
+            return array_slice.ArraySlice(self, start, stop, step)
         return array_view.ArrayView(self, key)
+
+Object.registries.append(Array.contents)
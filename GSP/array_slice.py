@@ -7,19 +7,48 @@ from typing import Union
 from GSP import OID, Object, command
 from typeguard import typechecked
 from array import Array
+from view import View
 
-class ArraySlice(Object):
+class ArraySlice(View):
+    """ Items [start:stop:step] of an array (or of a view) """
 
     @typechecked
     @command("")
-    def __init__(self, array : Array,
-                       start : int
-                       stop : int):
+    def __init__(self, array : Union[Array, View],
+                       start : int,
+                       stop : int,
+                       step : int = 1):
         Object.__init__(self)
+        if step < 1:
+            raise ValueError(f"Slice step must be positive ({step})")
         self.array = array
         self.start = start
         self.stop = stop
-    
-    def __repr__(self):
-        return f'ArraySlice [id={self.id}]: Array[id={self.array.id}]["{self.start}:{self.stop}"]'
+        self.step = step
+        self._heads = {}
+
+    def select(self, segments):
+        count = sum(len(segment) for segment in segments)
+        start, stop, step = slice(self.start, self.stop, self.step).indices(count)
+        selected, offset = [], 0
+        for segment in segments:
+            # First selected item in this segment
+            first = start + max(0, -(-(offset - start) // step)) * step
+            last = min(stop, offset + len(segment))
+            if first < last:
+                selected.append(segment[first-offset:last-offset:step])
+            offset += len(segment)
+        return selected or [segments[0][:0]]
 
+    def map(self, starts, stops):
+        count = View.length(self.array)
+        start, stop, step = slice(self.start, self.stop, self.step).indices(count)
+        size = len(range(start, stop, step))
+        mapped = [(max(0, -(-(lo - start) // step)), min(size, -(-(hi - start) // step)))
+                  for lo, hi in zip(starts, stops)]
+        mapped = [(lo, hi) for lo, hi in mapped if lo < hi]
+        return [lo for lo, hi in mapped], [hi for lo, hi in mapped]
+
+    def __repr__(self):
+        return (f'ArraySlice [id={self.id}]: {type(self.array).__name__}[id={self.array.id}]'
+                f'[{self.start}:{self.stop}:{self.step}]')
@@ -7,18 +7,26 @@ from typing import Union
 from GSP import OID, Object, command
 from typeguard import typechecked
 from array import Array
+from view import View
 
 
-class ArrayView(Object):
+class ArrayView(View):
+    """ Field of a structured array (or of a view) """
 
     @typechecked
     @command("")
-    def __init__(self, array : Array,
+    def __init__(self, array : Union[Array, View],
                        key : str):
         Object.__init__(self)
         self.array = array
         self.key = key
-    
-    def __repr__(self):
-        return f'ArrayView [id={self.id}]: Array[id={self.array.id}]["{self.key}"]'
+        self._heads = {}
+
+    def select(self, segments):
+        return [segment[self.key] for segment in segments]
 
+    def map(self, starts, stops):
+        return starts, stops
+
+    def __repr__(self):
+        return f'ArrayView [id={self.id}]: {type(self.array).__name__}[id={self.array.id}]["{self.key}"]'
@@ -0,0 +1,528 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+# Microbenchmark suite
+#
+#   python benchmark.py run [-o results.json] [-r repeat] [-k pattern]
+#   python benchmark.py compare before.json after.json [-t threshold]
+#
+# Each benchmark reports the best time (over repeat runs) of a single run of n
+# operations. Results are saved as JSON together with the environment (commit,
+# python & numpy versions) such that they can be compared between commits.
+# -----------------------------------------------------------------------------
+import io
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import multiprocessing
+import numpy as np
+import GSP
+from array import Array
+from datatype import Datatype
+from canvas import Canvas
+from viewport import Viewport
+from dispatch import Dispatcher
+from pyramid import Pyramid
+from shared_array import SharedArray
+from transform_matrix import TransformMatrix
+from transform_chain import TransformChain
+from transform_colormap import TransformColormap
+from writer import Writer
+
+benchmarks = {}
+
+def benchmark(name, n):
+    """ Register a benchmark made of n operations. The decorated function
+    prepares the benchmark and returns the function to be timed, or the
+    function to be timed and a cleanup function. The timed function may
+    return a dict of additional measures (e.g. bytes sent), saved along with
+    the results of its last run. """
+
+    def decorator(func):
+        benchmarks[name] = (func, n)
+        return func
+    return decorator
+
+
+def client(format="yaml"):
+    GSP.mode("client", reset=True, output=False, format=format)
+    GSP.Command.commands = []
+
+def record(count, format="yaml"):
+    """ Record a session of about count commands """
+
+    client(format)
+    canvas = Canvas(512, 512, 100, 1, False)
+    viewport = Viewport(canvas, 0, 0, 512, 512)
+    array = Array.from_numpy(np.zeros(1000, dtype=np.float32))
+    data = np.ones(10, dtype=np.float32).tobytes()
+    for i in range((count-5)//3):
+        canvas.set_size(512+i, 512+i)
+        viewport.set_position(i, i)
+        array.set_data(i % 990, data)
+    return list(GSP.commands())
+
+
+@benchmark("create/canvas", 1000)
+def create_canvas(n):
+    client()
+    return lambda: [Canvas(512, 512, 100, 1, False) for i in range(n)]
+
+@benchmark("create/viewport", 1000)
+def create_viewport(n):
+    client()
+    canvas = Canvas(512, 512, 100, 1, False)
+    return lambda: [Viewport(canvas, 0, 0, 512, 512) for i in range(n)]
+
+@benchmark("create/array", 1000)
+def create_array(n):
+    client()
+    datatype = Datatype("f4")
+    data = np.zeros(100, dtype=np.float32).tobytes()
+    return lambda: [Array(100, datatype, data) for i in range(n)]
+
+@benchmark("create/array/struct", 1000)
+def create_array_struct(n):
+    client()
+    datatype = "f4:position:3;u1:color:4;f4:size:1;"
+    data = np.zeros(100*20, dtype=np.uint8).tobytes()
+    return lambda: [Array(100, datatype, data) for i in range(n)]
+
+@benchmark("create/array/unrecorded", 10_000)
+def create_array_unrecorded(n):
+    GSP.mode("server", reset=True)
+    datatype = Datatype("f4:position:3;u1:color:4;f4:size:1;")
+    data = np.zeros(100*20, dtype=np.uint8).tobytes()
+    return lambda: [Array(100, datatype, data) for i in range(n)]
+
+for size in (16, 4096, 1_048_576):
+    @benchmark(f"set_data/{size}", 100 if size < 1_000_000 else 10)
+    def set_data(n, size=size):
+        client("binary")
+        array = Array.from_numpy(np.zeros(size, dtype=np.float32))
+        data = np.ones(size, dtype=np.float32).tobytes()
+        return lambda: [array.set_data(0, data) for i in range(n)]
+
+for format in ("yaml", "binary"):
+    @benchmark(f"write/{format}", 1000)
+    def write(n, format=format):
+        client(format)
+        canvas = Canvas(512, 512, 100, 1, False)
+        parameters = { "id": canvas.id, "width": 512, "height": 512 }
+        return lambda: [GSP.Command.write(canvas, "Canvas/set_size", parameters) for i in range(n)]
+
+    @benchmark(f"process/{format}", 1000)
+    def process(n, format=format):
+        commands = record(n, format)
+        def run():
+            GSP.mode("server", reset=True)
+            for command in commands:
+                GSP.process(command, globals())
+        return run
+
+    @benchmark(f"dispatch/{format}", 1000)
+    def dispatch(n, format=format):
+        commands = record(n, format)
+        dispatcher = Dispatcher(globals())
+        def run():
+            GSP.mode("server", reset=True)
+            for command in commands:
+                dispatcher.process(command)
+        return run
+
+    # Upload of a 100k elements array
+    @benchmark(f"upload/{format}", 1)
+    def upload(n, format=format):
+        client(format)
+        Z = np.random.uniform(-1, 1, 100_000).astype(np.float32)
+        def run():
+            for i in range(n):
+                Array.from_numpy(Z)
+            return { "bytes" : sum(len(command) for command in GSP.commands()) }
+        return run
+
+    @benchmark(f"process/upload/{format}", 1)
+    def process_upload(n, format=format):
+        client(format)
+        Array.from_numpy(np.random.uniform(-1, 1, 100_000).astype(np.float32))
+        commands = list(GSP.commands())
+        def run():
+            GSP.mode("server", reset=True)
+            for i in range(n):
+                for command in commands:
+                    GSP.process(command, globals())
+        return run
+
+dtypes = { "vec3" : np.dtype((np.float32, 3)),
+           "struct" : np.dtype([("position", np.float32, 3),
+                                ("color", np.float32, 4),
+                                ("size", np.float32)]) }
+for name, dtype in dtypes.items():
+    @benchmark(f"datatype/from_numpy/{name}", 10_000)
+    def from_numpy(n, dtype=dtype):
+        return lambda: [Datatype.from_numpy(dtype) for i in range(n)]
+
+    @benchmark(f"datatype/to_numpy/{name}", 10_000)
+    def to_numpy(n, dtype=dtype):
+        datatype = Datatype.from_numpy(dtype)
+        return lambda: [Datatype.to_numpy(datatype) for i in range(n)]
+
+@benchmark("equal/log", 1)
+def equal(n):
+    commands = dict(enumerate(record(3000)))
+    return lambda: [GSP.Command.equal(commands, commands) for i in range(n)]
+
+
+# Streaming updates of a 1M elements array: full writes versus delta encoding
+for rate in (0.001, 0.01, 0.1):
+    for method in ("set_data", "update"):
+        @benchmark(f"stream/{method}/{100*rate:g}%", 10)
+        def stream(n, rate=rate, method=method):
+            client("binary")
+            Z = np.random.uniform(0, 1, 1_000_000).astype(np.float32)
+            array = Array.from_numpy(Z)
+            frames = []
+            for i in range(n):
+                Z = Z.copy()
+                Z[np.random.randint(0, len(Z), int(rate*len(Z)))] += np.float32(0.001)
+                frames.append(Z)
+            GSP.Command.commands = []
+            def run():
+                for Z in frames:
+                    if method == "update":
+                        array.update(Z)
+                    else:
+                        array.set_data(0, Z)
+                return { "bytes/frame" : sum(len(command) for command in GSP.commands()) / n }
+            return run
+
+
+# Upload and full update of a 64 MB array to a server process, with data in
+# commands versus data in shared memory
+def serve(connection):
+    """ Apply commands received through connection and acknowledge them """
+
+    GSP.mode("server", reset=True)
+    connection.send_bytes(b"ready")
+    while True:
+        command = connection.recv_bytes()
+        if command == b"quit":
+            break
+        GSP.process(command, globals())
+        connection.send_bytes(b"ok")
+
+for name, cls in (("commands", Array), ("shared", SharedArray)):
+    @benchmark(f"upload/server/{name}", 1)
+    def upload_process(n, cls=cls):
+        connection, child = multiprocessing.Pipe()
+        process = multiprocessing.get_context("spawn").Process(target=serve, args=(child,))
+        process.start()
+        connection.recv_bytes()
+        client("binary")
+        Z = np.ones(16*2**20, dtype=np.float32)
+        def send():
+            for command in GSP.commands():
+                connection.send_bytes(command)
+                connection.recv_bytes()
+            GSP.Command.commands = []
+        def run():
+            for i in range(n):
+                array = cls.from_numpy(Z)
+                send()
+                array.set_data(0, Z)
+                send()
+                array.destroy()
+                send()
+        def cleanup():
+            connection.send_bytes(b"quit")
+            process.join()
+        return run, cleanup
+
+
+# Pick, rectangle and lasso requests over 1M points (grid index)
+def points(n=1_000_000):
+    GSP.mode("server", reset=True)
+    canvas = Canvas(1024, 1024, 100, 1, False)
+    viewport = Viewport(canvas, 0, 0, 1024, 1024)
+    positions = Array.from_numpy(np.random.normal(0, 0.3, (n, 3)).astype(np.float32))
+    return viewport, positions
+
+@benchmark("pick/index", 1)
+def pick_index(n):
+    viewport, positions = points()
+    return lambda: [viewport.pick(positions, 512, 512, 1) for i in range(n)]
+
+@benchmark("pick/pick", 100)
+def pick(n):
+    viewport, positions = points()
+    viewport.pick(positions, 512, 512, 1)
+    return lambda: [viewport.pick(positions, 530, 500, 3) for i in range(n)]
+
+@benchmark("pick/select", 100)
+def pick_select(n):
+    viewport, positions = points()
+    viewport.pick(positions, 512, 512, 1)
+    return lambda: [viewport.select(positions, 500, 500, 520, 520) for i in range(n)]
+
+for count in (32, 512):
+    @benchmark(f"pick/lasso/{count}", 100)
+    def pick_lasso(n, count=count):
+        viewport, positions = points()
+        viewport.pick(positions, 512, 512, 1)
+        angles = np.linspace(0, 2*np.pi, count, endpoint=False)
+        lasso = (512 + 40*np.stack([np.cos(angles), np.sin(angles)], axis=-1)).astype(np.float32)
+        return lambda: [viewport.lasso(positions, lasso) for i in range(n)]
+
+@benchmark("pick/set_data", 100)
+def pick_set_data(n):
+    viewport, positions = points()
+    viewport.pick(positions, 512, 512, 1)
+    indices = 3*np.random.randint(0, 1_000_000, n)
+    data = np.zeros(3, dtype=np.float32)
+    def run():
+        for index in indices:
+            positions.set_data(int(index), data)
+            viewport.pick(positions, 530, 500, 3)
+    return run
+
+
+# Min/max pyramid of a 10M samples signal drawn in 800 pixels
+def signal(n=10_000_000):
+    GSP.mode("server", reset=True)
+    array = Array.from_numpy(np.cumsum(np.random.normal(0, 1, n)).astype(np.float32))
+    return array, Pyramid(array)
+
+@benchmark("pyramid/build", 1)
+def pyramid_build(n):
+    array, pyramid = signal()
+    return lambda: [pyramid.update() for i in range(n)]
+
+for name, (first, last) in (("full", (0, 10_000_000)),
+                            ("zoom", (5_000_000, 5_010_000))):
+    @benchmark(f"pyramid/lines/{name}", 100)
+    def pyramid_lines(n, first=first, last=last):
+        array, pyramid = signal()
+        pyramid.update()
+        return lambda: [pyramid.lines(800, first, last) for i in range(n)]
+
+@benchmark("pyramid/update", 100)
+def pyramid_update(n):
+    array, pyramid = signal()
+    pyramid.update()
+    offsets = np.random.randint(0, 10_000_000-1000, n)
+    data = np.zeros(1000, dtype=np.float32)
+    def run():
+        for offset in offsets:
+            array.set_data(int(offset), data)
+            pyramid.update()
+    return run
+
+
+# 1M positions transformed by a chain of matrices, applying every matrix in
+# turn versus the cached product of a TransformChain
+def chain(count):
+    GSP.mode("server", reset=True)
+    positions = Array.from_numpy(np.random.uniform(-1, 1, (1_000_000, 3)).astype(np.float32))
+    transforms = []
+    for i in range(count):
+        M = np.eye(4, dtype=np.float32)
+        M[:3, 3] = np.random.uniform(-1, 1, 3)
+        transforms.append(TransformMatrix(M))
+    return positions, transforms
+
+for count in (1, 8):
+    @benchmark(f"transform/in_turn/{count}", 10)
+    def transform_in_turn(n, count=count):
+        positions, transforms = chain(count)
+        def run():
+            for i in range(n):
+                P = positions._array
+                for transform in transforms:
+                    P = transform.apply(P, out=np.empty((len(P), 3), dtype=np.float32))
+        return run
+
+    @benchmark(f"transform/chain/{count}", 10)
+    def transform_chain(n, count=count):
+        positions, transforms = chain(count)
+        transform = TransformChain(transforms)
+        return lambda: [transform.apply(positions) for i in range(n)]
+
+    @benchmark(f"transform/chain/modified/{count}", 10)
+    def transform_chain_modified(n, count=count):
+        positions, transforms = chain(count)
+        transform = TransformChain(transforms)
+        def run():
+            for i in range(n):
+                transforms[0].set_data(transforms[0]._array)
+                transform.apply(positions)
+        return run
+
+
+# 1M values mapped to colors: normalization and HSV conversion on every draw
+# (as in the datoviz proof of concept) versus a lookup table
+def hsv_colors(values):
+    """ Normalized values to RGBA through a vectorized HSV to RGB conversion
+    (same as matplotlib's) """
+
+    h = (values - values.min()) / (values.max() - values.min())
+    i = (h * 6.0).astype(int)
+    f = (h * 6.0) - i
+    v, p, q, t = np.ones_like(h), np.zeros_like(h), 1.0 - f, f
+    r, g, b = np.empty_like(h), np.empty_like(h), np.empty_like(h)
+    for k, (rk, gk, bk) in enumerate([(v, t, p), (q, v, p), (p, v, t),
+                                      (p, q, v), (t, p, v), (v, p, q)]):
+        idx = i % 6 == k
+        r[idx], g[idx], b[idx] = rk[idx], gk[idx], bk[idx]
+    rgb = np.stack([r, g, b], axis=-1)
+    return np.c_[(255*rgb).astype(np.uint8), np.full(len(h), 255)]
+
+def colormap():
+    GSP.mode("server", reset=True)
+    values = Array.from_numpy(np.random.uniform(0, 1, 1_000_000).astype(np.float32))
+    return values, TransformColormap(values, "hsv")
+
+@benchmark("colormap/hsv", 10)
+def colormap_hsv(n):
+    values, transform = colormap()
+    return lambda: [hsv_colors(values._array) for i in range(n)]
+
+for size in (256, 4096):
+    @benchmark(f"colormap/lut/{size}", 10)
+    def colormap_lut(n, size=size):
+        values, transform = colormap()
+        def run():
+            for i in range(n):
+                values.touch(0, 1)
+                transform.apply(size=size)
+        return run
+
+@benchmark("colormap/cached", 10)
+def colormap_cached(n):
+    values, transform = colormap()
+    transform.apply(size=4096)
+    return lambda: [transform.apply(size=4096) for i in range(n)]
+
+
+# Producer latency of direct output and of the background writer when the
+# output is slow (e.g. a pipe to a busy consumer)
+class SlowSink(io.StringIO):
+    """ Sink that takes some time for each write """
+
+    def write(self, text):
+        time.sleep(0.0005)
+        return io.StringIO.write(self, text)
+
+for name in ("direct", "writer"):
+    @benchmark(f"output/{name}", 500)
+    def output(n, name=name):
+        stdout, sys.stdout = sys.stdout, SlowSink()
+        writer = Writer(SlowSink(), maxsize=n, policy="block") if name == "writer" else None
+        GSP.mode("client", reset=True, record=False, output=True, format="yaml", writer=writer)
+        canvas = Canvas(512, 512, 100, 1, False)
+        def run():
+            latencies = np.empty(n)
+            for i in range(n):
+                start = time.perf_counter()
+                canvas.set_size(i, i)
+                latencies[i] = time.perf_counter() - start
+            p50, p99 = np.percentile(latencies, [50, 99])
+            return { "p50" : p50, "p99" : p99 }
+        def cleanup():
+            if writer is not None:
+                writer.close()
+            GSP.mode("server", reset=True, writer=None)
+            sys.stdout = stdout
+        return run, cleanup
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return { "commit" : commit,
+             "python" : platform.python_version(),
+             "numpy" : np.__version__,
+             "machine" : platform.machine(),
+             "date" : time.strftime("%Y-%m-%dT%H:%M:%S") }
+
+def run(pattern="", repeat=5):
+    """ Run benchmarks whose name contains pattern and return the results """
+
+    results = {}
+    for name, (func, n) in benchmarks.items():
+        if pattern not in name:
+            continue
+        times = []
+        for i in range(repeat):
+            timed, cleanup = func(n), None
+            if isinstance(timed, tuple):
+                timed, cleanup = timed
+            start = time.perf_counter()
+            measures = timed()
+            times.append(time.perf_counter() - start)
+            if cleanup is not None:
+                cleanup()
+        results[name] = { "n" : n, "best" : min(times), "median" : float(np.median(times)) }
+        if isinstance(measures, dict):
+            results[name]["measures"] = measures
+        print(f"{name:<28} {1e6*min(times)/n:12.2f} µs/op", file=sys.stderr)
+    GSP.mode("server", reset=True)
+    return { "environment" : environment(), "results" : results }
+
+def compare(before, after, threshold=0.1):
+    """ Print the per operation time of benchmarks in both results and return
+    the names of those that are slower by more than threshold """
+
+    print(f"{'benchmark':<28} {'before':>12} {'after':>12} {'ratio':>8}")
+    regressions = []
+    for name, result in after["results"].items():
+        if name not in before["results"]:
+            continue
+        t0 = before["results"][name]["best"] / before["results"][name]["n"]
+        t1 = result["best"] / result["n"]
+        ratio = t1/t0
+        flag = ""
+        if ratio > 1+threshold:
+            regressions.append(name)
+            flag = " slower"
+        elif ratio < 1-threshold:
+            flag = " faster"
+        print(f"{name:<28} {1e6*t0:9.2f} µs {1e6*t1:9.2f} µs {ratio:7.2f}x{flag}")
+    return regressions
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="GSP microbenchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    parser_run = subparsers.add_parser("run", help="run benchmarks")
+    parser_run.add_argument("-o", "--output", help="JSON results file")
+    parser_run.add_argument("-r", "--repeat", type=int, default=5)
+    parser_run.add_argument("-k", "--pattern", default="",
+                            help="only run benchmarks whose name contains pattern")
+    parser_compare = subparsers.add_parser("compare", help="compare two results files")
+    parser_compare.add_argument("before")
+    parser_compare.add_argument("after")
+    parser_compare.add_argument("-t", "--threshold", type=float, default=0.1,
+                                help="relative change considered significant")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run(args.pattern, args.repeat)
+        if args.output:
+            with open(args.output, "w") as file:
+                json.dump(results, file, indent=2)
+        else:
+            json.dump(results, sys.stdout, indent=2)
+    else:
+        with open(args.before) as file:
+            before = json.load(file)
+        with open(args.after) as file:
+            after = json.load(file)
+        sys.exit(1 if compare(before, after, args.threshold) else 0)
@@ -23,19 +23,19 @@ class Canvas(Object):
         self.offscreen = offscreen
 
     @typechecked        
-    @command("set_size")
+    @command("set_size", coalesce="replace")
     def set_size(self, width :  int, 
                        height : int):
         self.width = width
         self.height = height
 
     @typechecked        
-    @command("set_dpi")
+    @command("set_dpi", coalesce="replace")
     def set_dpi(self, dpi : Union[int,float]) :
         self.dpi = dpi
 
     @typechecked
-    @command("set_dpr")
+    @command("set_dpr", coalesce="replace")
     def set_dpr(self, dpr : Union[int,float]) :
         self.dpr = dpr
 
@@ -2,66 +2,171 @@
 # Graphic Server Protocol (GSP) — reference implementation
 # Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
 # -----------------------------------------------------------------------------
+# Datatype grammar:
+#
+#   datatype := item (";" item)* [";"]
+#   item     := type [":" name [":" count]]
+#   type     := numpy type ("f4", "u1", "float32", ...) | alias | "{" datatype "}"
+#   count    := integer ("x" integer)*
+#
+# Aliases (vec3, cvec4, mat4, ...) are small vectors and matrices. Two
+# special types control the layout of a structure without defining a field:
+# "pad::n" inserts n bytes and "align::n" moves the next field to a multiple
+# of n bytes (the structure size being a multiple of the largest alignment).
+# -----------------------------------------------------------------------------
+import sys
+import functools
 import numpy as np
 from typing import Union
 from GSP import OID, Object, command
 from typeguard import typechecked
 
+aliases = {}
+for prefix, base in (("", "f4"), ("d", "f8"), ("i", "i4"), ("u", "u4"), ("c", "u1")):
+    for n in (2, 3, 4):
+        aliases[f"{prefix}vec{n}"] = (base, (n,))
+for n in (2, 3, 4):
+    aliases[f"mat{n}"] = ("f4", (n, n))
+    aliases[f"dmat{n}"] = ("f8", (n, n))
+
+
+def tokenize(datatype, index=0):
+    """ Parse the items of a datatype starting at index, up to the end of
+    the string or a closing brace. Return the list of (type, name, shape)
+    items where type is a string or a nested list of items. """
+
+    items = []
+    while index < len(datatype) and datatype[index] != "}":
+        if datatype[index] == ";":
+            index += 1
+            continue
+        fields = []
+        if datatype[index] == "{":
+            itype, index = tokenize(datatype, index+1)
+            if index >= len(datatype):
+                raise ValueError(f"Unbalanced braces in datatype '{datatype}'")
+            index += 1
+            fields.append(itype)
+            if index < len(datatype) and datatype[index] == ":":
+                index += 1
+        while len(fields) < 3:
+            end = index
+            while end < len(datatype) and datatype[end] not in ":;{}":
+                end += 1
+            fields.append(datatype[index:end])
+            index = end
+            if index >= len(datatype) or datatype[index] != ":":
+                break
+            index += 1
+        if index < len(datatype) and datatype[index] not in ";}":
+            raise ValueError(f"Unexpected '{datatype[index]}' at {index} in datatype '{datatype}'")
+        itype, iname, icount = (fields + ["", ""])[:3]
+        try:
+            shape = tuple(int(n) for n in icount.split("x")) if icount else (1,)
+        except ValueError:
+            raise ValueError(f"Invalid count '{icount}' in datatype '{datatype}'")
+        items.append((itype, iname, shape))
+    return items, index
+
+def build(items, nested=False):
+    """ Build the numpy dtype described by a list of items. A single field
+    at top level gives a plain (unnamed) dtype. """
+
+    names, formats, offsets = [], [], []
+    offset, alignment, layout = 0, 1, False
+    for itype, iname, shape in items:
+        count = int(np.prod(shape))
+        if itype in ("pad", "align"):
+            layout = True
+            if itype == "pad":
+                offset += count
+            else:
+                alignment = max(alignment, count)
+                offset = -(-offset // count) * count
+            continue
+        if isinstance(itype, list):
+            base = build(itype, nested=True)
+        elif itype in aliases:
+            base, ashape = aliases[itype]
+            shape = ashape if shape == (1,) else shape + ashape
+        else:
+            base = itype
+        try:
+            dtype = np.dtype((base, shape))
+        except TypeError:
+            raise ValueError(f"Unknown type '{itype}'")
+        names.append(iname)
+        formats.append(dtype)
+        offsets.append(offset)
+        offset += dtype.itemsize
+    if len(names) == 1 and not (layout or nested):
+        return formats[0]
+    if not all(names):
+        raise ValueError("Fields of a structured datatype must be named")
+    if not layout:
+        return np.dtype(list(zip(names, formats)))
+    return np.dtype({ "names" : names, "formats" : formats, "offsets" : offsets,
+                      "itemsize" : -(-offset // alignment) * alignment })
+
+@functools.lru_cache(maxsize=256)
+def parse(datatype):
+    """ Numpy dtype of a datatype string (cached) """
+
+    items, index = tokenize(datatype.replace(" ", ""))
+    if index < len(datatype.replace(" ", "")):
+        raise ValueError(f"Unbalanced braces in datatype '{datatype}'")
+    if not items:
+        raise ValueError(f"Empty datatype '{datatype}'")
+    return build(items)
+
+def typecode(dtype):
+    """ Short type code (byte order only if not native) or nested datatype """
+
+    if dtype.names:
+        return "{%s}" % describe(dtype)
+    code = dtype.str
+    native = "<" if sys.byteorder == "little" else ">"
+    return code[1:] if code[0] in ("|", "=", native) else code
+
+@functools.lru_cache(maxsize=256)
+def describe(dtype):
+    """ Datatype string of a numpy dtype (cached) """
+
+    def shape(dtype):
+        if dtype.subdtype:
+            base, shape = dtype.subdtype
+            return base, "x".join(str(n) for n in shape)
+        return dtype, "1"
+
+    if not dtype.names:
+        base, count = shape(dtype)
+        return "%s::%s;" % (typecode(base), count) if dtype.subdtype else "%s;" % typecode(base)
+    datatype, offset = "", 0
+    for name, (ftype, foffset) in sorted(dtype.fields.items(), key=lambda item: item[1][1]):
+        if foffset < offset:
+            raise ValueError(f"Overlapping fields in {dtype}")
+        if foffset > offset:
+            datatype += "pad::%d;" % (foffset - offset)
+        base, count = shape(ftype)
+        datatype += "%s:%s:%s;" % (typecode(base), name, count)
+        offset = foffset + ftype.itemsize
+    if dtype.itemsize > offset:
+        datatype += "pad::%d;" % (dtype.itemsize - offset)
+    return datatype
+
+
 class Datatype(Object):
 
     # Convenience method, not part of the protocol
     @classmethod
     def from_numpy(cls, dtype):
-        datatype = ""
-        dtype = str(dtype)
-        if dtype.startswith("["):
-            for item in eval(dtype):
-                if len(item) == 2:
-                    iname, itype = item
-                    isize = 1
-                else:
-                    iname, itype, isize = item
-                    isize = np.prod(isize)
-                iname = iname.strip()
-                itype = itype.strip()
-                datatype += "%s:%s:%d;" % (itype,iname,isize)
-        elif dtype.startswith("("):
-            itype, isize = eval(dtype)
-            isize = np.prod(isize)
-            datatype += "%s::%d;" % (itype,isize)
-        else:
-            datatype += "%s;" % (dtype)
-        return datatype
+        return describe(np.dtype(dtype))
 
     # Convenience method, not part of the protocol
     @classmethod
     def to_numpy(cls, datatype):
-        dtype = []
-        datatype = datatype.replace(" ", "")
-        for item in datatype.split(";"):
-            if not len(item): continue
-            item = item.split(":")
-            if len(item) == 3:
-                itype, iname, isize = item
-                if not len(iname):
-                    dtype.append((itype, (int(isize),)))
-                else:
-                    dtype.append((iname, itype, (int(isize),)))
-            elif len(item) == 2:
-                itype, iname = item
-                dtype.append((iname, itype, (1,)))
-            elif len(item) == 1:
-                itype = item[0]
-                dtype.append((itype, (1,)))
-        if len(dtype) == 1:
-            dtype = dtype[0]
-            if len(dtype) == 3: 
-                return dtype[1:]
-            else:
-                return dtype
-        else:
-            return dtype
-    
+        return parse(datatype)
+
     @typechecked
     @command("")
     def __init__(self, datatype : str):
@@ -0,0 +1,78 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import typing
+import inspect
+from GSP import OID, Object, Command
+
+
+def validator(func):
+    """ Compile the annotations of func into a {name: types} dictionary
+    suitable for isinstance, or return None if some annotation cannot be
+    checked that way. """
+
+    types = {}
+    for name, hint in typing.get_type_hints(func).items():
+        if name == "return":
+            continue
+        args = typing.get_args(hint) if typing.get_origin(hint) is typing.Union else (hint,)
+        if not all(isinstance(arg, type) for arg in args):
+            return None
+        types[name] = args
+    return types
+
+
+class Dispatcher:
+    """ Server fast path for Command.process.
+
+    The dispatch table maps each "Class/method" of the given namespace to its
+    unwrapped implementation (i.e. without the typechecked and command
+    wrappers) together with a compiled validator. Commands whose parameters
+    pass the validator are applied directly, the others go through the
+    regular (typechecked) methods. """
+
+    def __init__(self, namespace):
+        self.table = {}
+        for classname, cls in namespace.items():
+            if not (isinstance(cls, type) and issubclass(cls, Object)):
+                continue
+            for name in dir(cls):
+                func = getattr(cls, name, None)
+                method = getattr(func, "method", None)
+                if method is None:
+                    continue
+                key = "%s/%s" % (classname, method) if method else classname
+                self.table[key] = (cls, method, func, inspect.unwrap(func),
+                                   validator(inspect.unwrap(func)))
+
+    def process(self, command):
+        """ Process a command and create or update the corresponding object. """
+
+        data = Command.read(command)
+        cls, method, func, handler, types = self.table[data["method"]]
+        parameters = data["parameters"]
+        object_id = parameters.pop("id")
+
+        # Resolve objects references and validate in a single pass
+        valid = types is not None and len(parameters) == len(types)
+        for key, value in parameters.items():
+            if isinstance(value, OID):
+                value = parameters[key] = Object.objects[value]
+            elif isinstance(value, list):
+                value = parameters[key] = [Object.objects[item] if isinstance(item, OID) else item
+                                           for item in value]
+            if valid and not isinstance(value, types.get(key, ())):
+                valid = False
+
+        if method:
+            if valid:
+                return handler(Object.objects[object_id], **parameters)
+            return func(Object.objects[object_id], **parameters)
+        if valid:
+            object = cls.__new__(cls)
+            handler(object, **parameters)
+        else:
+            object = cls(**parameters)
+        object.id = object_id
+        Object.objects[object_id] = object
@@ -0,0 +1,110 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import numpy as np
+from view import View
+
+
+def reduce(ufunc, values, factor):
+    """ Reduce consecutive groups of factor values (the last one possibly
+    being shorter) """
+
+    count = len(values) // factor * factor
+    result = values[0:count:factor].copy()
+    for i in range(1, factor):
+        ufunc(result, values[i:count:factor], out=result)
+    if count < len(values):
+        result = np.append(result, ufunc.reduce(values[count:]))
+    return result
+
+
+class Pyramid:
+    """ Min/max decimation pyramid of a one dimensional array of samples
+    (an array or a view). Each bin of level k holds the min and max of
+    factor**k consecutive samples such that a signal can be drawn with a
+    number of vertices proportional to the width of a viewport while
+    keeping its peaks visible.
+
+    The pyramid is built on the first request and then updated from the
+    modified ranges of the array, only recomputing the affected bins. """
+
+    def __init__(self, array, factor=4):
+        self.array = array
+        self.factor = factor
+        self.levels = []
+        self.computed = 0
+
+    def samples(self):
+        data = self.array.data() if isinstance(self.array, View) else self.array._array
+        if data.ndim == 2 and data.shape[1] == 1:
+            data = data[:,0]
+        if data.ndim != 1 or data.dtype.names:
+            raise ValueError(f"Pyramid needs one dimensional scalar samples, not {data.dtype}{data.shape}")
+        return data
+
+    def update(self):
+        """ Recompute the bins affected by modifications of the array """
+
+        _, ranges = self.array.dirty(self)
+        if not ranges:
+            return
+        samples = self.samples()
+        if not isinstance(self.array, View):
+            size = max(1, int(np.prod(self.array._array.shape[1:])))
+            ranges = [(start // size, -(-stop // size)) for start, stop in ranges]
+        if not self.levels or len(self.levels[0][0]) != len(samples):
+            self.levels = [(samples, samples)]
+            n = len(samples)
+            while n > 1:
+                n = -(-n // self.factor)
+                self.levels.append((np.empty(n, samples.dtype), np.empty(n, samples.dtype)))
+            ranges = [(0, len(samples))]
+        else:
+            self.levels[0] = (samples, samples)
+        factor = self.factor
+        for start, stop in ranges:
+            for k in range(1, len(self.levels)):
+                mins, maxs = self.levels[k-1]
+                start, stop = start // factor, -(-stop // factor)
+                first, last = start*factor, min(stop*factor, len(mins))
+                self.levels[k][0][start:stop] = reduce(np.fmin, mins[first:last], factor)
+                self.levels[k][1][start:stop] = reduce(np.fmax, maxs[first:last], factor)
+                self.computed += stop - start
+
+    def select(self, width, start=0, stop=None):
+        """ Return (level, x, mins, maxs) for the most detailed level having
+        at most 2*width bins over the [start, stop) samples, x being the
+        index of the first sample of each bin """
+
+        self.update()
+        start, stop, _ = slice(start, stop).indices(len(self.levels[0][0]))
+        for level, (mins, maxs) in enumerate(self.levels):
+            size = self.factor**level
+            first, last = start // size, -(-stop // size)
+            if last - first <= 2*width or level == len(self.levels)-1:
+                break
+        x = np.arange(first, last) * size
+        return level, x, mins[first:last], maxs[first:last]
+
+    def lines(self, width, start=0, stop=None):
+        """ Vertices (x, y) of a line strip drawing the [start, stop) samples
+        over width pixels: the samples themselves at full resolution, else
+        the min and max of each bin. Vertices being float32, x is relative
+        to start (sample indices above 2**24 cannot be represented). """
+
+        level, x, mins, maxs = self.select(width, start, stop)
+        start, _, _ = slice(start, stop).indices(len(self.levels[0][0]))
+        x = x - start
+        if level == 0:
+            return np.stack([x, mins], axis=-1).astype(np.float32)
+        vertices = np.empty((2*len(x), 2), dtype=np.float32)
+        vertices[0::2,0] = vertices[1::2,0] = x + self.factor**level / 2
+        vertices[0::2,1], vertices[1::2,1] = mins, maxs
+        return vertices
+
+    def release(self):
+        """ Stop tracking modifications of the array """
+
+        self.array.untrack(self)
+        self.levels = []
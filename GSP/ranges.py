@@ -0,0 +1,67 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import bisect
+import numpy as np
+
+
+class Ranges:
+    """ Sorted set of disjoint [start, stop) ranges.
+
+    Overlapping or adjacent ranges are merged as they are added. When there
+    are more than limit ranges, the ranges separated by the smallest gaps are
+    merged such that many small writes collapse into a few larger ones. """
+
+    def __init__(self, limit=16):
+        self.limit = limit
+        self.starts = []
+        self.stops = []
+
+    def add(self, start, stop):
+        """ Add the [start, stop) range """
+
+        if stop <= start:
+            return
+        # Ranges that overlap or touch [start, stop)
+        lo = bisect.bisect_left(self.stops, start)
+        hi = bisect.bisect_right(self.starts, stop)
+        if lo < hi:
+            start = min(start, self.starts[lo])
+            stop = max(stop, self.stops[hi-1])
+        self.starts[lo:hi] = [start]
+        self.stops[lo:hi] = [stop]
+
+        while len(self.starts) > self.limit:
+            gaps = [self.starts[i+1] - self.stops[i] for i in range(len(self.starts)-1)]
+            i = gaps.index(min(gaps))
+            del self.stops[i], self.starts[i+1]
+
+    def update(self, starts, stops):
+        """ Add many sorted and disjoint ranges (given as numpy arrays) """
+
+        # Merge the ranges separated by the smallest gaps beforehand
+        count = self.limit - 1
+        if len(starts) > self.limit:
+            gaps = starts[1:] - stops[:-1]
+            keep = np.sort(np.argpartition(gaps, len(gaps)-count)[len(gaps)-count:]) if count else []
+            starts = np.concatenate([starts[:1], starts[1:][keep]])
+            stops = np.concatenate([stops[:-1][keep], stops[-1:]])
+        for start, stop in zip(starts.tolist(), stops.tolist()):
+            self.add(start, stop)
+
+    def clear(self):
+        """ Remove and return all ranges as a list of (start, stop) """
+
+        ranges = list(zip(self.starts, self.stops))
+        self.starts, self.stops = [], []
+        return ranges
+
+    def __iter__(self):
+        return zip(self.starts, self.stops)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __repr__(self):
+        return f"Ranges({list(self)})"
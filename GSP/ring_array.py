@@ -0,0 +1,92 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import numpy as np
+from typing import Union
+from GSP import OID, Object, Bytes, command, _buffer
+from typeguard import typechecked
+from datatype import Datatype
+from array import Array
+
+
+class RingArray(Array):
+    """ Fixed capacity array (first dimension of shape) where items are
+    appended after the most recent one, overwriting the oldest ones when
+    full. Items are stored in place, the logical order being given by the
+    head (next write position) and the count of valid items. """
+
+    # Convenience method, not part of the protocol
+    @classmethod
+    def empty(cls, capacity, dtype):
+        dtype = np.dtype(dtype)
+        shape = [capacity] + list(dtype.shape)
+        return RingArray(shape, Datatype(Datatype.from_numpy(dtype.base)))
+
+    @typechecked
+    @command("")
+    def __init__(self, shape : Union[int,list],
+                       datatype : Union[str,Datatype]):
+        Object.__init__(self)
+        self.shape = shape
+        if isinstance(datatype, (Datatype,)):
+            self.datatype = datatype
+        else:
+            self.datatype = Datatype(datatype)
+        dtype = np.dtype(Datatype.to_numpy(self.datatype.datatype))
+        self._array = np.zeros(shape, dtype=dtype.base)
+        self._version = 0
+        self._dirty = {}
+        self._hash = None
+        self._blocks = None
+        self.head = 0
+        self.count = 0
+
+    @typechecked
+    @command("append")
+    def append(self, data : Bytes):
+        self.own()
+        capacity = len(self._array)
+        items = np.frombuffer(_buffer(data), dtype=self._array.dtype)
+        items = items.reshape((-1,) + self._array.shape[1:])[-capacity:]
+        size = self._array[0].size
+        n = len(items)
+        first = min(n, capacity - self.head)
+        self._array[self.head:self.head+first] = items[:first]
+        self._array[:n-first] = items[first:]
+        if n > first:
+            self.touch(np.array([0, self.head*size]),
+                       np.array([(n-first)*size, capacity*size]))
+        else:
+            self.touch(self.head*size, (self.head+n)*size)
+        self.head = (self.head + n) % capacity
+        self.count = min(self.count + n, capacity)
+
+    # Convenience method, not part of the protocol
+    def segments(self, start=0, stop=None):
+        """ Items [start, stop) in logical order (oldest first) as one or two
+        views of the underlying array """
+
+        start, stop, _ = slice(start, stop).indices(self.count)
+        if stop <= start:
+            return [self._array[:0]]
+        capacity = len(self._array)
+        first = (self.head - self.count + start) % capacity
+        last = first + (stop - start)
+        if last <= capacity:
+            return [self._array[first:last]]
+        return [self._array[first:], self._array[:last-capacity]]
+
+    # Convenience method, not part of the protocol
+    def to_numpy(self):
+        """ Copy of the valid items in logical order """
+
+        return np.concatenate(self.segments())
+
+    def __repr__(self):
+        return (f"RingArray [id={self.id}]: {tuple(self.shape)}, {self.datatype}, "
+                f"head={self.head}, count={self.count}")
+
+    def __eq__(self, other):
+        return (Array.__eq__(self, other) and
+                (self.head, self.count) == (other.head, other.count))
@@ -0,0 +1,189 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import struct
+import asyncio
+import itertools
+from GSP import Command, encode, decode
+
+# Transport messages: kind (1 byte) | size (u64) | payload
+#
+#   client -> server  "C" command (yaml or binary frame)
+#                     "Q" request tag (u64) | command (a result is expected)
+#   server -> client  "K" credits (u32)
+#                     "R" request tag (u64) | encoded result
+#                     "E" request tag (u64) | error message, the tag being
+#                         NOTAG for a failed command
+#
+# Flow control is credit based: a client may only send as many messages as it
+# has been granted credits for. The server grants credits on connection and
+# gives them back as commands are applied, such that the amount of data the
+# server has to hold does not depend on the speed of producers.
+MESSAGE = struct.Struct("<cQ")
+TAG = struct.Struct("<Q")
+CREDITS = struct.Struct("<I")
+NOTAG = TAG.pack(2**64 - 1)
+
+
+async def read_message(reader):
+    """ Read a (kind, payload) message or return (None, None) on EOF """
+
+    try:
+        kind, size = MESSAGE.unpack(await reader.readexactly(MESSAGE.size))
+        return kind, await reader.readexactly(size)
+    except asyncio.IncompleteReadError:
+        return None, None
+
+def write_message(writer, kind, *payloads):
+    writer.write(MESSAGE.pack(kind, sum(len(payload) for payload in payloads)))
+    for payload in payloads:
+        writer.write(payload)
+
+
+class Server:
+    """ Asyncio GSP server listening on a unix domain socket or on a local
+    TCP port. Commands from all connections are applied in the order they
+    are received through process (Command.process by default). """
+
+    def __init__(self, globals=None, credits=64, process=None):
+        self.globals = globals
+        self.credits = credits
+        self.process = process or (lambda command: Command.process(command, self.globals))
+        self.server = None
+        self.count = 0
+
+    async def start(self, path=None, host="127.0.0.1", port=0):
+        """ Start listening on path (unix socket) or on host:port """
+
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        write_message(writer, b"K", CREDITS.pack(self.credits))
+        await writer.drain()
+        consumed = 0
+        try:
+            while True:
+                kind, payload = await read_message(reader)
+                if kind is None:
+                    break
+                if kind == b"Q":
+                    tag, command = payload[:TAG.size], payload[TAG.size:]
+                    try:
+                        write_message(writer, b"R", tag, encode(self.process(command)))
+                    except Exception as error:
+                        write_message(writer, b"E", tag, repr(error).encode())
+                else:
+                    try:
+                        self.process(payload)
+                    except Exception as error:
+                        write_message(writer, b"E", NOTAG, repr(error).encode())
+                self.count += 1
+
+                # Give credits back by batches
+                consumed += 1
+                if consumed >= max(1, self.credits // 4) or reader.at_eof():
+                    write_message(writer, b"K", CREDITS.pack(consumed))
+                    consumed = 0
+                    await writer.drain()
+        finally:
+            writer.close()
+
+
+class Client:
+    """ Asyncio GSP client. Errors raised by (result less) commands are
+    collected in errors. """
+
+    def __init__(self):
+        self.credits = 0
+        self.inflight = 0
+        self.max_inflight = 0
+        self.tags = itertools.count()
+        self.results = {}
+        self.errors = []
+        self.closed = False
+
+    async def connect(self, path=None, host="127.0.0.1", port=0):
+        """ Connect to a server on path (unix socket) or on host:port """
+
+        if path is not None:
+            self.reader, self.writer = await asyncio.open_unix_connection(path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.granted = asyncio.Condition()
+        self.task = asyncio.ensure_future(self.receive())
+
+    async def receive(self):
+        while True:
+            kind, payload = await read_message(self.reader)
+            if kind is None:
+                break
+            if kind == b"E" and payload[:TAG.size] == NOTAG:
+                self.errors.append(payload[TAG.size:].decode())
+                continue
+            if kind == b"K":
+                count, = CREDITS.unpack(payload)
+                async with self.granted:
+                    self.credits += count
+                    self.inflight = max(0, self.inflight - count)
+                    self.granted.notify_all()
+            else:
+                tag, = TAG.unpack_from(payload)
+                future = self.results.pop(tag)
+                if kind == b"R":
+                    future.set_result(decode(payload[TAG.size:]))
+                else:
+                    future.set_exception(RuntimeError(payload[TAG.size:].decode()))
+
+        # Connection closed by the server: fail pending requests and wake
+        # up tasks waiting for credits
+        self.closed = True
+        for future in self.results.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Connection closed by server"))
+        self.results = {}
+        async with self.granted:
+            self.granted.notify_all()
+
+    async def acquire(self):
+        async with self.granted:
+            await self.granted.wait_for(lambda: self.credits > 0 or self.closed)
+            if self.closed:
+                raise ConnectionError("Connection closed by server")
+            self.credits -= 1
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+
+    async def send(self, command):
+        """ Send a command, waiting for credits if necessary """
+
+        await self.acquire()
+        if isinstance(command, str):
+            command = command.encode()
+        write_message(self.writer, b"C", command)
+        await self.writer.drain()
+
+    async def request(self, command):
+        """ Send a command and return its result """
+
+        await self.acquire()
+        if isinstance(command, str):
+            command = command.encode()
+        tag = next(self.tags)
+        future = self.results[tag] = asyncio.get_running_loop().create_future()
+        write_message(self.writer, b"Q", TAG.pack(tag), command)
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.task.cancel()
@@ -0,0 +1,172 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import os
+import sys
+import atexit
+import multiprocessing
+import numpy as np
+from typing import Union
+from multiprocessing import shared_memory, resource_tracker
+from GSP import OID, Object, command, _buffer
+from typeguard import typechecked
+from datatype import Datatype
+from array import Array
+
+# Shared memory segments used by this process: name -> [segment, users, owner]
+#
+# The process creating a segment owns it and removes it when the last array
+# using it is destroyed or at exit (or, if it crashes, the multiprocessing
+# resource tracker does). Other processes only close their mapping, which
+# remains valid even if the owner has already removed the segment.
+segments = {}
+
+# Segments that could not be closed yet since views on them still exist
+closing = []
+
+
+class Segment(shared_memory.SharedMemory):
+    """ Shared memory segment that can be collected while views on it still
+    exist (the mapping is then released with the last view) """
+
+    def __del__(self):
+        try:
+            self.close()
+        except (OSError, BufferError):
+            pass
+
+
+def create(nbytes):
+    """ Create a new segment of nbytes and return its name """
+
+    segment = Segment(create=True, size=max(nbytes, 1))
+    segments[segment.name] = [segment, 0, True]
+    return segment.name
+
+def attach(name):
+    """ Return the buffer of the named segment """
+
+    if name not in segments:
+        # Only the owner is responsible for removing the segment, hence the
+        # segment must not stay registered with the resource tracker of this
+        # process. A process started by multiprocessing shares the tracker of
+        # its parent (the owner usually), where the segment is registered
+        # already: unregistering it there would also drop the registration
+        # of the owner.
+        if sys.version_info >= (3, 13):
+            segment = Segment(name=name, track=False)
+        else:
+            segment = Segment(name=name)
+            # (segments are registered by their posix name)
+            if os.name == "posix" and multiprocessing.parent_process() is None:
+                resource_tracker.unregister("/" + segment.name, "shared_memory")
+        segments[name] = [segment, 0, False]
+    segments[name][1] += 1
+    return segments[name][0].buf
+
+def detach(name):
+    """ Release the named segment, closing (and removing if owned) it when
+    it is not used anymore """
+
+    entry = segments.get(name)
+    if entry is None:
+        return
+    entry[1] -= 1
+    if entry[1] <= 0:
+        del segments[name]
+        segment, _, owner = entry
+        if owner:
+            segment.unlink()
+        closing.append(segment)
+    close()
+
+def close():
+    """ Close the detached segments that are not viewed anymore """
+
+    for segment in list(closing):
+        try:
+            segment.close()
+        except BufferError:
+            continue
+        closing.remove(segment)
+
+@atexit.register
+def cleanup():
+    for name, entry in list(segments.items()):
+        entry[1] = 0
+        detach(name)
+
+
+class SharedArray(Array):
+    """ Array whose data lives in a shared memory segment such that data is
+    never sent through commands. Writes are followed by a notify command
+    telling which elements have been modified. """
+
+    # Convenience method, not part of the protocol
+    @classmethod
+    def from_numpy(cls, Z):
+        if (isinstance(Z, np.ndarray)):
+            datatype = Datatype(Datatype.from_numpy(Z.dtype))
+            name = create(Z.nbytes)
+            segments[name][0].buf[:Z.nbytes] = _buffer(Z)
+            return SharedArray(list(Z.shape), datatype, name)
+        raise ValueError(f"Unknown type for {Z}, cannot convert to SharedArray")
+
+    @typechecked
+    @command("")
+    def __init__(self, shape : Union[int,list],
+                       datatype : Union[str,Datatype],
+                       segment : str):
+        Object.__init__(self)
+        self.shape = shape
+        if isinstance(datatype, (Datatype,)):
+            self.datatype = datatype
+        else:
+            self.datatype = Datatype(datatype)
+        self.segment = segment
+        dtype = np.dtype(Datatype.to_numpy(self.datatype.datatype))
+        nbytes = dtype.itemsize * int(np.prod(shape))
+        self._array = np.frombuffer(attach(segment)[:nbytes], dtype=dtype).reshape(shape)
+        self._version = 0
+        self._dirty = {}
+        self._hash = None
+        self._blocks = None
+
+    # Convenience method, not part of the protocol
+    def set_data(self, offset, data):
+        """ Write data in shared memory and notify the modified elements """
+
+        data = np.frombuffer(_buffer(data), dtype=self._array.dtype)
+        self._array.reshape(-1)[offset:offset+data.size] = data
+        self.notify(offset, data.size)
+
+    # Convenience method, not part of the protocol
+    def set_delta(self, indices, values):
+        """ XOR the elements at indices (uint32) with values in shared memory
+        and notify the modified elements """
+
+        indices = np.frombuffer(_buffer(indices), dtype=np.uint32)
+        if not len(indices):
+            return
+        itemsize = self._array.dtype.itemsize
+        items = self._array.reshape(-1).view(np.uint8).reshape(-1, itemsize)
+        items[indices] ^= np.frombuffer(_buffer(values), dtype=np.uint8).reshape(-1, itemsize)
+        self.notify(int(indices[0]), int(indices[-1]) + 1 - int(indices[0]))
+
+    @typechecked
+    @command("notify")
+    def notify(self, offset : int,
+                     count : int):
+        self.touch(offset, offset+count)
+
+    # Convenience method, not part of the protocol
+    def release(self):
+        Array.release(self)
+        # Arrays restored from a snapshot own their data
+        if not self._array.flags.owndata:
+            self._array = np.empty(0, dtype=self._array.dtype)
+            detach(self.segment)
+
+    def __repr__(self):
+        return f"SharedArray [id={self.id}]: {tuple(self.shape)}, {self.datatype}, {self.segment}"
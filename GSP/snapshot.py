@@ -0,0 +1,313 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import yaml
+import struct
+import numpy as np
+from GSP import OID, Object, Command, Loader, Loaders, _buffer
+
+# Snapshot file layout:
+#
+#   magic (4 bytes) | index size (u64) | index (yaml) | buffer 1 | buffer 2 | ...
+#
+# The index is the list of objects (class, id, registered, state) where
+# references to other objects are replaced by a !Ref to their position in the
+# list and numpy arrays (or bytes) by a !Buffer giving the location of their
+# raw content in the file.
+MAGIC = b"GSPS"
+PREFIX = struct.Struct("<4sQ")
+
+
+class Ref(yaml.YAMLObject):
+    """ Reference to an object of the snapshot """
+
+    yaml_tag = "!Ref"
+    yaml_loader = Loaders
+
+    def __init__(self, index):
+        self.index = index
+
+    @classmethod
+    def to_yaml(cls, representer, node):
+        return representer.represent_scalar(cls.yaml_tag, str(node.index))
+
+    @classmethod
+    def from_yaml(cls, loader, node):
+        return cls(int(node.value))
+
+
+class Buffer(yaml.YAMLObject):
+    """ Location and layout of a raw buffer of the snapshot """
+
+    yaml_tag = "!Buffer"
+    yaml_loader = Loaders
+
+    def __init__(self, offset, size, dtype=None, shape=None):
+        self.offset = offset
+        self.size = size
+        self.dtype = dtype
+        self.shape = shape
+
+    @classmethod
+    def to_yaml(cls, representer, node):
+        return representer.represent_mapping(cls.yaml_tag, vars(node))
+
+    @classmethod
+    def from_yaml(cls, loader, node):
+        return cls(**loader.construct_mapping(node, deep=True))
+
+
+def _descr(dtype):
+    """ yaml compatible description of a numpy dtype """
+
+    if dtype.names is None:
+        if dtype.subdtype is not None:
+            base, shape = dtype.subdtype
+            return [_descr(base), list(shape)]
+        return dtype.str
+    return { "names" : list(dtype.names),
+             "formats" : [_descr(dtype.fields[name][0]) for name in dtype.names],
+             "offsets" : [dtype.fields[name][1] for name in dtype.names],
+             "itemsize" : dtype.itemsize }
+
+def _dtype(descr):
+    """ numpy dtype from its yaml compatible description """
+
+    if isinstance(descr, str):
+        return np.dtype(descr)
+    elif isinstance(descr, list):
+        return np.dtype((_dtype(descr[0]), tuple(descr[1])))
+    return np.dtype({ **descr, "formats" : [_dtype(item) for item in descr["formats"]] })
+
+
+def save(filename, objects=None):
+    """ Save the live objects graph (including array contents) to filename. """
+
+    objects = Object.objects if objects is None else objects
+    registered = set(id(object) for object in objects.values())
+
+    # Collect objects (including unregistered ones that are referenced)
+    items, index = [], {}
+    def collect(object):
+        if id(object) not in index:
+            index[id(object)] = len(items)
+            items.append(object)
+            for item in object.references():
+                collect(item)
+    for object in objects.values():
+        collect(object)
+
+    entries, buffers = [], []
+    offset = 0
+    def encode(value):
+        nonlocal offset
+        if isinstance(value, Object):
+            return Ref(index[id(value)])
+        elif isinstance(value, (list, tuple)):
+            return [encode(item) for item in value]
+        elif isinstance(value, np.ndarray):
+            value = np.ascontiguousarray(value)
+            buffers.append(value.data.cast("B") if value.size else b"")
+            offset += value.nbytes
+            return Buffer(offset-value.nbytes, value.nbytes, _descr(value.dtype), list(value.shape))
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            value = memoryview(value).cast("B")
+            buffers.append(value)
+            offset += value.nbytes
+            return Buffer(offset-value.nbytes, value.nbytes)
+        elif isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    for object in items:
+        state = getattr(object, "__getstate__", lambda: vars(object))() or {}
+        entries.append({ "class" : object.__class__.__name__,
+                         "id" : object.id.id,
+                         "registered" : id(object) in registered,
+                         "state" : { key: encode(value) for key, value in state.items()
+                                     if key != "id" } })
+
+    header = yaml.dump(entries, default_flow_style=None, sort_keys=False).encode()
+    with open(filename, "wb") as file:
+        file.write(PREFIX.pack(MAGIC, len(header)))
+        file.write(header)
+        for buffer in buffers:
+            file.write(buffer)
+
+
+def load(filename, globals=None, locals=None):
+    """ Restore the objects saved in filename and register them. """
+
+    with open(filename, "rb") as file:
+        magic, size = PREFIX.unpack(file.read(PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a GSP snapshot")
+        entries = yaml.load(file.read(size), Loader=Loader) or []
+        start = PREFIX.size + size
+
+        def read(buffer):
+            file.seek(start + buffer.offset)
+            if buffer.dtype is None:
+                return file.read(buffer.size)
+            array = np.empty(buffer.shape, dtype=_dtype(buffer.dtype))
+            if buffer.size:
+                file.readinto(memoryview(array).cast("B"))
+            return array
+
+        # Create objects first such that references can be resolved
+        items = []
+        for entry in entries:
+            object = globals[entry["class"]].__new__(globals[entry["class"]])
+            object.id = OID(entry["id"])
+            items.append(object)
+
+        def decode(value):
+            if isinstance(value, Ref):
+                return items[value.index]
+            elif isinstance(value, Buffer):
+                return read(value)
+            elif isinstance(value, list):
+                return [decode(item) for item in value]
+            return value
+
+        for object, entry in zip(items, entries):
+            state = { key: decode(value) for key, value in entry["state"].items() }
+            if hasattr(object, "__setstate__"):
+                object.__setstate__(state)
+            else:
+                for key, value in state.items():
+                    setattr(object, key, value)
+            if entry["registered"]:
+                Object.objects[object.id] = object
+    return items
+
+
+def compact(commands):
+    """ Rewrite a command log into a minimal equivalent one.
+
+    Each live object is represented by a single creation command where the
+    effect of later setters (whose parameters are creation parameters) and of
+    Array writes has been folded. Destroyed objects and the objects depending
+    on them are dropped altogether, as well as requests and the commands
+    referencing destroyed objects. Commands keep their order in the log, but
+    are delayed after the creation of the objects they reference. """
+
+    import array
+    import datatype
+    import viewport   # (registers the viewport requests)
+
+    creates = {}     # object id -> [method, parameters]
+    timeline = []    # (object id, command that cannot be folded or None for creation)
+    buffers = {}     # object id -> mutable data of arrays
+    dependents = {}  # object id -> ids of objects whose creation referenced it
+
+    def references(value):
+        values = value if isinstance(value, list) else [value]
+        return [item for item in values if isinstance(item, OID)]
+
+    def depend(object_id, parameters):
+        for value in parameters.values():
+            for other_id in references(value):
+                if other_id != object_id:
+                    dependents.setdefault(other_id, set()).add(object_id)
+
+    def release(object_id):
+        creates.pop(object_id, None)
+        buffers.pop(object_id, None)
+        # (folded setters may have dropped the reference since)
+        for other_id in dependents.pop(object_id, ()):
+            if other_id in creates and any(object_id in references(value)
+                                           for value in creates[other_id][1].values()):
+                release(other_id)
+
+    for command in commands:
+        data = Command.read(command)
+        classname, _, method = data["method"].partition("/")
+        if method in Command.requests:
+            continue
+        parameters = data["parameters"]
+        object_id = parameters["id"]
+        if not method:
+            if isinstance(parameters.get("data"), str) and classname == "Array":
+                # Creation from a content hash: use the content of the source
+                # array since it may not be part of the compacted log
+                for other_id, (_, other) in creates.items():
+                    if "data" in other and not isinstance(other["data"], str):
+                        content = buffers.get(other_id, other["data"])
+                        if array.Array.digest(content) == parameters["data"]:
+                            parameters["data"] = bytes(_buffer(content))
+                            break
+            creates[object_id] = [data["method"], parameters]
+            depend(object_id, parameters)
+            timeline.append((object_id, None))
+            continue
+        if object_id not in creates:
+            continue
+        create = creates[object_id][1]
+        if method == "destroy":
+            release(object_id)
+        elif (method == "set_delta" or method == "set_data" and "offset" in parameters) \
+             and "data" in create:
+            if object_id not in buffers:
+                buffers[object_id] = bytearray(create["data"])
+            dtype = create["datatype"]
+            if isinstance(dtype, OID):
+                dtype = creates[dtype][1]["datatype"]
+            dtype = datatype.Datatype.to_numpy(dtype)
+            itemsize = np.zeros(0, dtype=dtype).dtype.itemsize
+            if method == "set_data":
+                start = parameters["offset"]*itemsize
+                payload = _buffer(parameters["data"])
+                buffers[object_id][start:start+len(payload)] = payload
+            else:
+                items = np.frombuffer(buffers[object_id], dtype=np.uint8).reshape(-1, itemsize)
+                indices = np.frombuffer(_buffer(parameters["indices"]), dtype=np.uint32)
+                values = np.frombuffer(_buffer(parameters["values"]), dtype=np.uint8)
+                items[indices] ^= values.reshape(-1, itemsize)
+        elif set(parameters) <= set(create):
+            create.update(parameters)
+            depend(object_id, parameters)
+        else:
+            timeline.append((object_id, data))
+
+    def referenced(parameters, object_id):
+        return [other_id for value in parameters.values() for other_id in references(value)
+                if other_id != object_id and other_id in creates]
+
+    # Position in the timeline after which an object can be created (folded
+    # parameters may reference objects created later)
+    index = { object_id: i for i, (object_id, data) in enumerate(timeline) if data is None }
+    ready = {}
+    def created(object_id):
+        if object_id not in ready:
+            ready[object_id] = index[object_id]
+            ready[object_id] = max([index[object_id]] +
+                                   [created(other_id) for other_id in
+                                    referenced(creates[object_id][1], object_id)])
+        return ready[object_id]
+
+    # Commands sorted by (position, delayed, log order), delayed ones being
+    # placed right after the creation they wait for
+    items = []
+    last = {}
+    for i, (object_id, data) in enumerate(timeline):
+        if object_id not in creates:
+            continue
+        if data is None:
+            method, parameters = creates[object_id]
+            if object_id in buffers:
+                parameters["data"] = bytes(buffers[object_id])
+            position = created(object_id)
+        else:
+            method, parameters = data["method"], data["parameters"]
+            if any(other_id not in creates for value in parameters.values()
+                   for other_id in references(value)):
+                continue
+            position = max([i, created(object_id), last.get(object_id, i)] +
+                           [created(other_id) for other_id in
+                            referenced(parameters, object_id)])
+            last[object_id] = position
+        items.append((position, position != i, i, method, parameters))
+    items.sort(key=lambda item: item[:3])
+    return [Command.write(None, method, parameters) for *_, method, parameters in items]
@@ -0,0 +1,294 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+# Uniform grid index of 2D positions (x, y being the first two components of
+# the items of an array or view) used to answer pick and selection requests.
+#
+# The grid is built on the first query. Modified positions are then moved out
+# of their cell to a sorted list of (current cell, index) keys, from which
+# queries only merge the points of the queried cells, and the grid is rebuilt
+# once this list gets too large (or the array is resized).
+# -----------------------------------------------------------------------------
+import weakref
+import numpy as np
+from view import View
+
+# Grid of each positions object: id(positions) -> Grid
+grids = {}
+
+
+class Grid:
+    """ Points sorted by cell (order) with the first point of each cell
+    (starts), for cells covering the bounding box of the positions """
+
+    density = 8         # Average number of points per cell
+    moved_ratio = 1/16  # Rebuild when moved points exceed this ratio
+
+    def __init__(self, positions):
+        self.positions = weakref.ref(positions)
+        self.points = None
+
+    def xy(self):
+        """ (n, 2) view of the x, y components of positions """
+
+        positions = self.positions()
+        data = positions.data() if isinstance(positions, View) else positions._array
+        data = data.reshape(len(data), -1)
+        if data.shape[1] < 2:
+            raise ValueError(f"Positions need at least two components, not {data.shape[1]}")
+        return data[:, :2]
+
+    def cells(self, points):
+        cx = ((points[:,0] - self.origin[0]) * self.scale[0]).astype(np.int64)
+        cy = ((points[:,1] - self.origin[1]) * self.scale[1]).astype(np.int64)
+        return np.clip(cy, 0, self.side-1) * self.side + np.clip(cx, 0, self.side-1)
+
+    def build(self, points):
+        n = len(points)
+        self.side = max(1, min(4096, int(np.sqrt(n / self.density))))
+        with np.errstate(invalid="ignore"):
+            lo, hi = np.fmin.reduce(points, axis=0), np.fmax.reduce(points, axis=0)
+        if not (np.isfinite(lo).all() and np.isfinite(hi).all()):
+            finite = points[np.isfinite(points).all(axis=1)]
+            lo = finite.min(axis=0) if len(finite) else np.zeros(2)
+            hi = finite.max(axis=0) if len(finite) else np.ones(2)
+        self.origin = lo.astype(np.float64)
+        self.scale = self.side / np.maximum(hi - lo, 1e-12).astype(np.float64)
+        cells = self.cells(points)
+        self.order = np.argsort(cells)
+        self.starts = np.zeros(self.side*self.side + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=self.side*self.side), out=self.starts[1:])
+        self.keys = np.zeros(0, dtype=np.int64)   # cell * count + index of moved points
+        self.current = None                       # current cell of points (-1 if not moved)
+        self.count = n
+
+    def move(self, moved, points):
+        """ Move the given points out of their cell to the moved keys """
+
+        n = self.count
+        if self.current is None:
+            self.current = np.full(n, -1, dtype=np.int32)
+        previous = self.current[moved]
+        again = previous >= 0
+        if again.any():
+            stale = np.sort(previous[again].astype(np.int64) * n + moved[again])
+            self.keys = np.delete(self.keys, np.searchsorted(self.keys, stale))
+        cells = self.cells(points[moved])
+        self.current[moved] = cells
+        keys = np.sort(cells * n + moved)
+        self.keys = np.insert(self.keys, np.searchsorted(self.keys, keys), keys)
+
+    def update(self):
+        """ Update the grid with the modified positions and return them """
+
+        positions = self.positions()
+        points = self.xy()
+        _, ranges = positions.dirty(self)
+        if not isinstance(positions, View):
+            size = max(1, int(np.prod(positions._array.shape[1:])))
+            ranges = [(start // size, -(-stop // size)) for start, stop in ranges]
+        if self.points is None or len(points) != self.count:
+            self.build(points)
+        elif ranges:
+            moved = np.concatenate([np.arange(start, stop) for start, stop in ranges])
+            if len(self.keys) + len(moved) > self.moved_ratio * self.count:
+                self.build(points)
+            else:
+                self.move(moved, points)
+        self.points = points
+        return points
+
+    def coordinates(self, indices):
+        """ x and y coordinates of the given points (gathered by component,
+        which is much faster than gathering rows of a strided array) """
+
+        return self.points[:,0][indices], self.points[:,1][indices]
+
+    def span(self, rows, first, last):
+        """ Indices of the points of the cells [first, last] of each row """
+
+        starts = self.starts[rows*self.side + first]
+        stops = self.starts[rows*self.side + last + 1]
+        selected = [self.order[start:stop] for start, stop in zip(starts, stops) if stop > start]
+        indices = np.concatenate(selected) if selected else np.zeros(0, dtype=np.int64)
+        return self.moved(indices, rows*self.side + first, rows*self.side + last + 1)
+
+    def gather(self, cells):
+        """ Indices of the points of the given cells """
+
+        starts = self.starts[cells]
+        counts = self.starts[cells+1] - starts
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        return self.moved(self.order[offsets + np.arange(len(offsets))], cells, cells+1)
+
+    def moved(self, indices, lo, hi):
+        """ Replace the moved points of indices (found in their initial cell)
+        by the moved points currently in the [lo, hi) cell ranges """
+
+        if not len(self.keys):
+            return indices
+        n = self.count
+        starts = np.searchsorted(self.keys, np.asarray(lo, dtype=np.int64) * n)
+        stops = np.searchsorted(self.keys, np.asarray(hi, dtype=np.int64) * n)
+        selected = [self.keys[start:stop] % n for start, stop in zip(starts, stops) if stop > start]
+        return np.concatenate([indices[self.current[indices] < 0]] + selected)
+
+    def candidates(self, x0, y0, x1, y1):
+        """ Indices of points possibly inside the [x0, x1] x [y0, y1] rectangle """
+
+        (cx0, cy0), (cx1, cy1) = self.corners(x0, y0, x1, y1)
+        return self.span(np.arange(cy0, cy1+1), cx0, cx1)
+
+    def corners(self, x0, y0, x1, y1):
+        """ (column, row) of the cells of the corners of a rectangle """
+
+        corners = self.cells(np.array([[x0, y0], [x1, y1]]))
+        return np.stack([corners % self.side, corners // self.side], axis=-1)
+
+
+def grid(positions):
+    """ Up to date grid of positions """
+
+    key = id(positions)
+    if key not in grids or grids[key].positions() is not positions:
+        grids[key] = Grid(positions)
+        root = positions.root() if isinstance(positions, View) else None
+        weakref.finalize(positions, forget, key, grids[key], root)
+    grids[key].update()
+    return grids[key]
+
+def forget(key, index, root=None):
+    """ Drop the grid of (collected) positions, root being the array of
+    positions if they were a view """
+
+    if grids.get(key) is index:
+        del grids[key]
+    if root is not None:
+        root.untrack((key, index))
+
+def rectangle(positions, x0, y0, x1, y1):
+    """ Indices of positions inside the [x0, x1] x [y0, y1] rectangle """
+
+    index = grid(positions)
+    x0, x1 = min(x0, x1), max(x0, x1)
+    y0, y1 = min(y0, y1), max(y0, y1)
+    (cx0, cy0), (cx1, cy1) = index.corners(x0, y0, x1, y1)
+
+    # Cells strictly between the corner cells are inside the rectangle (cell
+    # computation being monotonic), only the points of the others are tested
+    rows = np.arange(cy0+1, cy1)
+    accepted = index.span(rows, cx0+1, cx1-1) if cx1 - cx0 > 1 else np.zeros(0, dtype=np.int64)
+    candidates = [index.span(np.unique([cy0, cy1]), cx0, cx1), index.span(rows, cx0, cx0)]
+    if cx1 > cx0:
+        candidates.append(index.span(rows, cx1, cx1))
+    candidates = np.concatenate(candidates)
+    x, y = index.coordinates(candidates)
+    inside = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+    return np.sort(np.concatenate([accepted, candidates[inside]]))
+
+def disc(positions, x, y, rx, ry):
+    """ Indices of positions inside the ellipse of center (x, y) and radii
+    (rx, ry), nearest first """
+
+    index = grid(positions)
+    rx, ry = abs(rx), abs(ry)
+    candidates = index.candidates(x-rx, y-ry, x+rx, y+ry)
+    dx, dy = index.coordinates(candidates)
+    dx, dy = dx - x, dy - y
+    # A null radius only matches points exactly at the center
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distances = (np.where(dx == 0, 0, dx / rx)**2 + np.where(dy == 0, 0, dy / ry)**2)
+    inside = distances <= 1
+    candidates, distances = candidates[inside], distances[inside]
+    return candidates[np.argsort(distances, kind="stable")]
+
+# Number of (edge, point) or (edge, cell) pairs tested at once by polygon queries
+block_size = 1 << 18
+
+def pairs(counts):
+    """ (owner, offset) of the pairs made by each owner with its counts
+    items, by blocks of at most block_size pairs """
+
+    ends = np.cumsum(counts)
+    total = int(ends[-1]) if len(ends) else 0
+    for start in range(0, total, block_size):
+        pair = np.arange(start, min(start+block_size, total))
+        owner = np.searchsorted(ends, pair, side="right")
+        yield owner, pair - (ends[owner] - counts[owner])
+
+def inside(x, y, vertices):
+    """ Whether (x, y) points are inside the polygon (even-odd rule) """
+
+    # Points crossing an edge (horizontally) are a range of points sorted by y
+    order = np.argsort(y)
+    xa, ya = vertices[:,0], vertices[:,1]
+    xb, yb = np.roll(xa, -1), np.roll(ya, -1)
+    lo = np.searchsorted(y[order], np.minimum(ya, yb))
+    hi = np.searchsorted(y[order], np.maximum(ya, yb))
+    crossings = np.zeros(len(x), dtype=np.int64)
+    for edge, offset in pairs(hi - lo):
+        point = order[lo[edge] + offset]
+        xa_, ya_, xb_, yb_ = xa[edge], ya[edge], xb[edge], yb[edge]
+        xc = xa_ + (y[point] - ya_) * (xb_ - xa_) / (yb_ - ya_)
+        crossings += np.bincount(point[x[point] < xc], minlength=len(x))
+    return crossings % 2 == 1
+
+def polygon(positions, vertices):
+    """ Indices of positions inside the polygon given as (n, 2) vertices
+    (even-odd rule) """
+
+    vertices = np.asarray(vertices, dtype=np.float64)
+    if vertices.ndim != 2 or vertices.shape[1] != 2:
+        raise ValueError(f"Polygon needs (n, 2) vertices, not {vertices.shape}")
+    # Empty, non finite or degenerate (collinear vertices) polygons contain nothing
+    if (len(vertices) < 3 or not np.isfinite(vertices).all()
+        or np.linalg.matrix_rank(vertices - vertices[0]) < 2):
+        return np.zeros(0, dtype=np.int64)
+    index = grid(positions)
+    (x0, y0), (x1, y1) = vertices.min(axis=0), vertices.max(axis=0)
+
+    # Cells covering the polygon bounding box
+    (cx0, cy0), (cx1, cy1) = index.corners(x0, y0, x1, y1)
+    cx, cy = np.meshgrid(np.arange(cx0, cx1+1), np.arange(cy0, cy1+1))
+    cx, cy = cx.ravel(), cy.ravel()
+
+    # Cells crossed by an edge (separating axis test), among the cells around
+    # the bounding box of each edge
+    xa, ya = vertices[:,0], vertices[:,1]
+    xb, yb = np.roll(xa, -1), np.roll(ya, -1)
+    first = index.cells(np.stack([np.minimum(xa, xb), np.minimum(ya, yb)], axis=-1))
+    last = index.cells(np.stack([np.maximum(xa, xb), np.maximum(ya, yb)], axis=-1))
+    ex0 = np.maximum(first % index.side - 1, 0)
+    ey0 = np.maximum(first // index.side - 1, 0)
+    width = np.minimum(last % index.side + 1, index.side-1) - ex0 + 1
+    height = np.minimum(last // index.side + 1, index.side-1) - ey0 + 1
+    # (slightly enlarged such that rounding cannot move a point out of its cell)
+    margin = 1e-6 / index.scale
+    crossed = []
+    for edge, offset in pairs(width * height):
+        ex, ey = ex0[edge] + offset % width[edge], ey0[edge] + offset // width[edge]
+        left = index.origin[0] + ex / index.scale[0] - margin[0]
+        bottom = index.origin[1] + ey / index.scale[1] - margin[1]
+        right = left + 1/index.scale[0] + 2*margin[0]
+        top = bottom + 1/index.scale[1] + 2*margin[1]
+        xa_, ya_, xb_, yb_ = xa[edge], ya[edge], xb[edge], yb[edge]
+        overlap = ((left <= np.maximum(xa_, xb_)) & (right >= np.minimum(xa_, xb_)) &
+                   (bottom <= np.maximum(ya_, yb_)) & (top >= np.minimum(ya_, yb_)))
+        sides = sum(np.sign((xb_-xa_)*(py-ya_) - (yb_-ya_)*(px-xa_))
+                    for px, py in ((left, bottom), (right, bottom), (left, top), (right, top)))
+        crossed.append((ey * index.side + ex)[overlap & (np.abs(sides) < 4)])
+    cells = cy * index.side + cx
+    boundary = np.isin(cells, np.concatenate(crossed)) if crossed else np.zeros(len(cells), dtype=bool)
+
+    # Border cells of the grid also hold points outside of it
+    border = (cx == 0) | (cy == 0) | (cx == index.side-1) | (cy == index.side-1)
+    test = boundary | border
+    centers_x = index.origin[0] + (cx + 0.5) / index.scale[0]
+    centers_y = index.origin[1] + (cy + 0.5) / index.scale[1]
+    interior = ~test & inside(centers_x, centers_y, vertices)
+    accepted = index.gather(cells[interior])
+    candidates = index.gather(cells[test])
+    x, y = index.coordinates(candidates)
+    candidates = candidates[inside(x.astype(np.float64), y.astype(np.float64), vertices)]
+    return np.sort(np.concatenate([accepted, candidates]))
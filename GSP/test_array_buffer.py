@@ -0,0 +1,40 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import GSP
+import numpy as np
+from array import Array
+from datatype import Datatype
+
+if __name__ == '__main__':
+
+    for format in ("yaml", "binary"):
+        GSP.mode("client", reset=True, output=False, format=format)
+        GSP.Command.commands = []
+        # ------------------------------------------
+        Z = np.arange(8, dtype=np.float32)
+        arrays = [ Array.from_numpy(Z),
+                   Array(8, Datatype("f4"), memoryview(Z)),
+                   Array(8, Datatype("f4"), bytearray(Z.tobytes())) ]
+        owned, inplace = True, True
+        for array in arrays:
+            address = array._array.__array_interface__["data"][0]
+            array.set_data(2, np.ones(2, dtype=np.float32))
+            array.set_data(4, memoryview(np.ones(2, dtype=np.float32)))
+            array.set_data(6, bytearray(np.ones(2, dtype=np.float32).tobytes()))
+            owned &= array._array.flags.owndata
+            inplace &= address == array._array.__array_interface__["data"][0]
+        Z[...] = -1
+        client_objects = GSP.objects()
+        expected = np.array([0, 1, 1, 1, 1, 1, 1, 1], dtype=np.float32)
+        values = all(np.array_equal(array._array, expected) for array in arrays)
+
+        GSP.mode("server", reset=True)
+        # ------------------------------------------
+        for command in GSP.commands():
+            GSP.process(command, globals(), locals())
+        server_objects = GSP.objects()
+        print(f"{format:>6}: owned {owned}, in place {inplace}, values {values}")
+        print(f"Test result: {owned and inplace and values and client_objects == server_objects}")
+    GSP.mode("server", reset=True, format="yaml")
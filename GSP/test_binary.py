@@ -0,0 +1,32 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import GSP
+import numpy as np
+from array import Array
+from datatype import Datatype
+from canvas import Canvas
+from viewport import Viewport
+
+if __name__ == '__main__':
+
+    GSP.mode("client", reset=True, output=False, format="binary")
+    # ------------------------------------------
+    canvas = Canvas(512, 512, 100, 1.5, False)
+    canvas.set_size(256, 256)
+    viewport = Viewport(canvas, 0, 0, 256, 256)
+    array = Array.from_numpy(np.arange(5, dtype=np.float32))
+    array.set_data(2, np.ones(3, dtype=np.float32).tobytes())
+    client_objects = GSP.objects()
+
+    GSP.mode("server", reset=True)
+    # ------------------------------------------
+    for command in GSP.commands():
+        GSP.process(command, globals(), locals())
+    server_objects = GSP.objects()
+    GSP.mode("server", reset=False, format="yaml")
+
+    print(f"Client: {client_objects}")
+    print(f"Server: {server_objects}")
+    print(f"Test result: {client_objects == server_objects}")
@@ -0,0 +1,78 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import GSP
+import numpy as np
+from array import Array
+from datatype import Datatype
+from canvas import Canvas
+from viewport import Viewport
+from transform_matrix import TransformMatrix
+
+def scene():
+    GSP.Command.commands = []
+    canvas = Canvas(512, 512, 100, 1, False)
+    viewport = Viewport(canvas, 0, 0, 512, 512)
+    transform = TransformMatrix.identity()
+    array = Array.from_numpy(np.zeros(100, dtype=np.float32))
+    for i in range(1000):
+        canvas.set_size(512+i, 512+i)
+        viewport.set_position(i, i)
+        transform.set_data(np.eye(4, dtype=np.float32).ravel().tobytes())
+    for i in range(10):
+        array.set_data(5*i, np.full(10, i, dtype=np.float32).tobytes())
+    array.set_data(90, np.ones(10, dtype=np.float32).tobytes())
+
+def replay(commands):
+    GSP.mode("server", reset=True, buffered=False)
+    results = [GSP.process(command, globals(), locals()) for command in commands]
+    return results, GSP.objects()
+
+def methods(commands):
+    return [GSP.Command.read(command)["method"] for command in commands]
+
+if __name__ == '__main__':
+
+    GSP.mode("client", reset=True, output=False, buffered=False)
+    # ------------------------------------------
+    scene()
+    _, unbuffered = replay(GSP.commands())
+
+    GSP.mode("client", reset=True, output=False, buffered=True)
+    # ------------------------------------------
+    scene()
+    count, size = GSP.flush()
+    client_objects = GSP.objects()
+    commands = GSP.commands()
+    print(f"Removed {count} commands ({size} bytes), kept {len(commands)}")
+
+    # Setters are collapsed to the last call and the overlapping writes of
+    # [0, 55) are merged, the write of [90, 100) being kept apart
+    expected = ["Canvas", "Viewport", "TransformMatrix", "Datatype", "Array",
+                "Canvas/set_size", "Viewport/set_position", "TransformMatrix/set_data",
+                "Array/set_data", "Array/set_data"]
+    _, buffered = replay(commands)
+    print(f"Test result: {count == 3*999 + 9 and sorted(methods(commands)) == sorted(expected)}")
+    # (identifiers differ between the two sessions)
+    same = list(buffered.values()) == list(unbuffered.values())
+    print(f"Test result: {client_objects == buffered and same}")
+
+    # Coalescing does not cross requests
+    GSP.mode("client", reset=True, output=False, buffered=True)
+    # ------------------------------------------
+    GSP.Command.commands = []
+    canvas = Canvas(512, 512, 100, 1, False)
+    viewport = Viewport(canvas, 0, 0, 512, 512)
+    positions = Array.from_numpy(np.zeros((10, 2), dtype=np.float32))
+    picked = []
+    for i in range(3):
+        positions.set_data(0, np.full(2, i/4, dtype=np.float32).tobytes())
+        viewport.set_position(0, i)
+        picked.append(viewport.pick(positions, 256, 256, 1))
+    GSP.flush()
+    commands = GSP.commands()
+    results, _ = replay(commands)
+    results = [result for result, method in zip(results, methods(commands))
+               if method == "Viewport/pick"]
+    print(f"Test result: {results == picked and len(set(picked)) == 3}")
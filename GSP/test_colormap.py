@@ -0,0 +1,78 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import GSP
+import colorsys
+import numpy as np
+from array import Array
+from datatype import Datatype
+from array_view import ArrayView
+from transform_colormap import TransformColormap
+import colormaps
+
+if __name__ == '__main__':
+
+    # Lookup tables
+    results = []
+    for size in (256, 4096):
+        for name in colormaps.names():
+            table = colormaps.lut(name, size)
+            results.append(table.shape == (size, 4) and table.dtype == np.uint8
+                           and not table.flags.writeable and colormaps.lut(name, size) is table)
+    hsv = colormaps.lut("HSV", 4096)
+    hues = np.linspace(0, 1, 4096)
+    expected = np.array([colorsys.hsv_to_rgb(h, 1, 1) for h in hues])
+    results.append(np.abs(hsv[:, :3] / 255 - expected).max() <= 1/255 + 1e-9)
+    print(f"Test result: {all(results)}")
+
+    # Colors of an array, client and server
+    for format in ("yaml", "binary"):
+        GSP.mode("client", reset=True, output=False, format=format)
+        GSP.Command.commands = []
+        # ------------------------------------------
+        Z = np.zeros(1000, dtype=[("x", np.float32), ("value", np.float32)])
+        Z["value"] = np.linspace(-1, 1, len(Z))
+        points = Array.from_numpy(Z)
+        transform = TransformColormap(points["value"], "Gray")
+        colors = transform.apply()
+        client_objects = GSP.objects()
+
+        GSP.mode("server", reset=True)
+        # ------------------------------------------
+        for command in GSP.commands():
+            GSP.process(command, globals(), locals())
+        server_objects = GSP.objects()
+        server = server_objects[transform.id].apply()
+        expected = np.round(255 * np.linspace(0, 1, len(Z))).astype(np.uint8)
+        result = (np.array_equal(colors, server) and np.array_equal(colors[:, 0], expected)
+                  and np.all(colors[:, 3] == 255))
+        print(f"Test result: {result and client_objects == server_objects}")
+
+    # Caching on (version, colormap, range) and reuse of the output
+    GSP.mode("server", reset=True)
+    values = Array.from_numpy(np.array([0, 0.5, 1, np.nan], dtype=np.float32))
+    transform = TransformColormap(values, "hot")
+    first = transform.apply()
+    cached = first.copy()
+    same = transform.apply()
+    reused = same is first and not first.flags.writeable
+    values.set_data(0, np.array([1], dtype=np.float32))
+    updated = transform.apply()
+    result = (reused and updated is first
+              and np.array_equal(updated[0], colormaps.lut("hot")[-1])
+              and np.array_equal(cached[3], colormaps.lut("hot")[0]))
+    ranged = transform.apply(0, 2)
+    result = result and np.array_equal(ranged[1], colormaps.lut("hot")[64])
+    print(f"Test result: {result}")
+
+    # Colormaps registered again are taken into account
+    colormaps.register("hot", [(0, 0, 1), (0, 0, 1)])
+    blue = transform.apply(0, 2).copy()
+    colormaps.register("hot", [(0, 0, 0), (1, 0, 0), (1, 1, 0), (1, 1, 1)], [0, 0.375, 0.75, 1])
+    print(f"Test result: {np.all(blue == [0, 0, 255, 255])}")
+
+    # uint8 values are used as indices
+    values = Array.from_numpy(np.arange(256, dtype=np.uint8))
+    colors = TransformColormap(values, "viridis").apply()
+    print(f"Test result: {np.array_equal(colors, colormaps.lut('viridis'))}")
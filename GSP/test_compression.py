@@ -0,0 +1,55 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import GSP
+import numpy as np
+from array import Array
+from datatype import Datatype
+
+dtypes = [ np.uint8, np.uint16, np.uint32, np.uint64,
+           np.int8, np.int16, np.int32, np.int64,
+           np.float16, np.float32, np.float64,
+           np.dtype((np.float32, 3)),
+           np.dtype([("position", np.float32, 3), ("color", np.uint8, 4)]) ]
+
+def roundtrip(format, codec, chunk, Z):
+    """ Upload and update Z, replay on server side and compare """
+
+    GSP.mode("client", reset=True, output=False, format=format,
+             compression=codec, chunk=chunk)
+    GSP.Command.commands = []
+    array = Array.from_numpy(Z)
+    Z = np.zeros_like(Z)
+    array.set_data(0, Z)
+    client_objects = GSP.objects()
+    commands = GSP.commands()
+
+    GSP.mode("server", reset=True)
+    for command in commands:
+        GSP.process(command, globals(), locals())
+    return client_objects == GSP.objects(), len(commands)
+
+if __name__ == '__main__':
+
+    results = []
+    for format in ("yaml", "binary"):
+        for codec in ("zlib", "lzma"):
+            for dtype in dtypes:
+                Z = np.zeros(10_000, dtype=dtype)
+                B = Z.view(np.uint8).reshape(-1)
+                B[::7] = np.arange(len(B[::7])) % 256
+                equal, count = roundtrip(format, GSP.Compression(codec, threshold=1024),
+                                         4096, Z)
+                size = np.dtype(dtype).itemsize * len(Z)
+                results.append(equal and count == 2 + (size + 4095) // 4096)
+    print(f"Test result: {all(results)}")
+
+    # Statistics
+    GSP.compression(reset=True)
+    roundtrip("binary", "zlib", 0, np.zeros(1_000_000, dtype=np.float32))
+    roundtrip("binary", "zlib", 0, np.random.uniform(0, 1, 1_000_000))
+    stats = GSP.compression()
+    print(f"Stats: {stats}")
+    print(f"Test result: {stats['compressed'] == 3 and stats['skipped'] == 1 and stats['ratio'] < 0.01}")
+    GSP.mode("server", reset=True, format="yaml", compression=False, chunk=0)
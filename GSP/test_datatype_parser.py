@@ -0,0 +1,80 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import GSP
+import numpy as np
+from array import Array
+from datatype import Datatype
+import datatype
+
+if __name__ == '__main__':
+
+    # Grammar
+    datatypes = {
+        "f4:x:1;f4:y:1;" : np.dtype([("x", "f4", (1,)), ("y", "f4", (1,))]),
+        "f4::3;" : np.dtype(("f4", (3,))),
+        "vec3:position:1;cvec4:color:1;" : np.dtype([("position", "f4", (3,)),
+                                                     ("color", "u1", (4,))]),
+        "mat4;" : np.dtype(("f4", (4, 4))),
+        "vec2:path:8;" : np.dtype(("f4", (8, 2))),
+        "f8:t:1;{f4:x:1;f4:y:1;}:points:2;" :
+            np.dtype([("t", "f8", (1,)),
+                      ("points", [("x", "f4", (1,)), ("y", "f4", (1,))], (2,))]),
+        "u1:flag:1;align::4;f4:value:1;" :
+            np.dtype({ "names" : ["flag", "value"], "formats" : [("u1", (1,)), ("f4", (1,))],
+                       "offsets" : [0, 4], "itemsize" : 8 }),
+        "f4:a:3;pad::4;" :
+            np.dtype({ "names" : ["a"], "formats" : [("f4", (3,))],
+                       "offsets" : [0], "itemsize" : 16 }),
+    }
+    results = [Datatype.to_numpy(key) == value for key, value in datatypes.items()]
+    print(f"Test result: {all(results)}")
+
+    # Round trip of numpy dtypes
+    dtypes = [ np.dtype(("f4", (3,))),
+               np.dtype([("a", "f4", (3,)), ("b", "u1", (2, 2))]),
+               np.dtype([("p", [("x", "f4", (1,)), ("y", "f4", (1,))], (1,)),
+                         ("q", ">i2", (1,))]),
+               np.dtype([("a", "u1", (1,)), ("b", "f8", (1,))], align=True) ]
+    results = []
+    for dtype in dtypes:
+        results.append(Datatype.to_numpy(Datatype.from_numpy(dtype)) == dtype)
+    print(f"Test result: {all(results)}")
+
+    # Errors
+    results = []
+    for text in ("{f4:x:1;", "f4}", "f4:a:1;f4::2;", "unknown;", "f4:a:b;", ""):
+        try:
+            Datatype.to_numpy(text)
+            results.append(False)
+        except ValueError:
+            results.append(True)
+    print(f"Test result: {all(results)}")
+
+    # Cache
+    datatype.parse.cache_clear()
+    for i in range(100):
+        Datatype.to_numpy("f4:position:3;u1:color:4;")
+    info = datatype.parse.cache_info()
+    print(f"Test result: {info.misses == 1 and info.hits == 99}")
+
+    # Arrays with nested and aligned datatypes
+    for format in ("yaml", "binary"):
+        GSP.mode("client", reset=True, output=False, format=format)
+        GSP.Command.commands = []
+        # ------------------------------------------
+        Z = np.zeros(10, dtype=np.dtype(datatypes["f8:t:1;{f4:x:1;f4:y:1;}:points:2;"]))
+        Z["points"]["x"] = np.arange(20).reshape(10, 2, 1)
+        array = Array.from_numpy(Z)
+        aligned = Array([4], "u1:flag:1;align::4;f4:value:1;", bytes(32))
+        client_objects = GSP.objects()
+
+        GSP.mode("server", reset=True)
+        # ------------------------------------------
+        for command in GSP.commands():
+            GSP.process(command, globals(), locals())
+        server_objects = GSP.objects()
+        result = (np.array_equal(server_objects[array.id]._array, Z)
+                  and server_objects[aligned.id]._array.itemsize == 8)
+        print(f"Test result: {result and client_objects == server_objects}")
@@ -0,0 +1,78 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import GSP
+import numpy as np
+import snapshot
+from array import Array
+from datatype import Datatype
+
+if __name__ == '__main__':
+
+    for format in ("yaml", "binary"):
+        GSP.mode("client", reset=True, output=False, format=format)
+        GSP.Command.commands = []
+        # ------------------------------------------
+        Z = np.random.uniform(0, 1, 100_000).astype(np.float32)
+        A = Array.from_numpy(Z, dedup=True)
+        B = Array.from_numpy(Z.copy(), dedup=True)
+        C = Array.from_numpy(Z.copy(), dedup=True)
+        sizes = [len(command) for command in GSP.commands()]
+        shared = (np.shares_memory(A._array, B._array) and np.shares_memory(A._array, C._array)
+                  and A._array.flags.writeable)
+        count, nbytes = Array.deduplicated()
+
+        # Copy on write
+        B.set_data(0, np.zeros(10, dtype=np.float32))
+        cow = (np.shares_memory(A._array, C._array) and not np.shares_memory(A._array, B._array)
+               and np.array_equal(A._array, Z) and B._array[:10].sum() == 0)
+        equal = A == C and not A == B and A.same_content(C) and not A.same_content(B)
+        A.destroy()
+
+        # Destroyed arrays are not matched anymore
+        W = np.random.uniform(0, 1, 1000).astype(np.float32)
+        D = Array.from_numpy(W, dedup=True)
+        E = Array.from_numpy(W.copy(), dedup=True)
+        D.destroy()
+        E.destroy()
+        F = Array.from_numpy(W.copy(), dedup=True)
+        unmatched = len(GSP.commands()[-1]) > W.nbytes
+        client_objects = GSP.objects()
+        commands = GSP.commands()
+
+        GSP.mode("server", reset=True)
+        # ------------------------------------------
+        Array.dedup = True
+        for command in commands:
+            GSP.process(command, globals(), locals())
+        server_objects = GSP.objects()
+
+        GSP.mode("server", reset=True)
+        for command in snapshot.compact(commands):
+            GSP.process(command, globals(), locals())
+        compacted_objects = GSP.objects()
+        Array.dedup = False
+
+        print(f"{format:>6}: commands {sizes} bytes, {count} arrays sharing {nbytes:,} bytes")
+        result = (shared and cow and equal and unmatched and nbytes == 2*Z.nbytes and max(sizes[2:]) < 1024
+                  and client_objects == server_objects == compacted_objects)
+        print(f"Test result: {result}")
+
+    # Registry is cleared on reset
+    GSP.mode("server", reset=True)
+    print(f"Test result: {Array.contents == {}}")
+
+    # Equality compares values and does not register content hashes
+    A = Array.from_numpy(np.arange(10, dtype=np.float32))
+    B = Array.from_numpy(np.arange(10, dtype=np.float32))
+    print(f"Test result: {A == B and A._hash is None and Array.contents == {}}")
+
+    # Incremental hash
+    Z = np.random.uniform(0, 1, 1_000_000).astype(np.float32)
+    A = Array.from_numpy(Z)
+    A.hash()
+    A.set_data(500_000, np.ones(10, dtype=np.float32))
+    stale = sum(block is None for block in A._blocks)
+    Z[500_000:500_010] = 1
+    print(f"Test result: {stale == 1 and A.hash() == Array.digest(Z)}")
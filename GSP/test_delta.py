@@ -0,0 +1,53 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import GSP
+import numpy as np
+import snapshot
+from array import Array
+from datatype import Datatype
+
+if __name__ == '__main__':
+
+    for format in ("yaml", "binary"):
+        GSP.mode("client", reset=True, output=False, format=format)
+        GSP.Command.commands = []
+        # ------------------------------------------
+        Z = np.zeros(1000, dtype=[("position", np.float32, 3), ("color", np.uint8, 4)])
+        array = Array.from_numpy(Z)
+        methods = []
+        for changes in (5, 1000, 0):
+            count = len(GSP.commands())
+            Z["position"][np.random.choice(len(Z), changes, replace=False)] += 1
+            array.update(Z)
+            methods.extend(GSP.Command.read(command)["method"].split("/")[-1]
+                           for command in GSP.commands()[count:])
+        Z["position"][200:210] = -1
+        array.update(Z)
+        client_objects = GSP.objects()
+        values = np.array_equal(array._array, Z)
+        commands = GSP.commands()
+
+        GSP.mode("server", reset=True)
+        # ------------------------------------------
+        for command in commands:
+            GSP.process(command, globals(), locals())
+        server_objects = GSP.objects()
+
+        GSP.mode("server", reset=True)
+        for command in snapshot.compact(commands):
+            GSP.process(command, globals(), locals())
+        compacted_objects = GSP.objects()
+
+        print(f"{format:>6}: {methods}")
+        result = (values and methods == ["set_delta", "set_data"]
+                  and client_objects == server_objects == compacted_objects)
+        print(f"Test result: {result}")
+
+    # Empty deltas leave the array untouched
+    array = Array.from_numpy(Z)
+    version = array._version
+    array.set_delta(np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint8))
+    print(f"Test result: {array._version == version and np.array_equal(array._array, Z)}")
+    GSP.mode("server", reset=True, format="yaml")
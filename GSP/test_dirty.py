@@ -0,0 +1,36 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import GSP
+import numpy as np
+from array import Array
+from ranges import Ranges
+
+if __name__ == '__main__':
+
+    # Merging of overlapping and adjacent ranges
+    ranges = Ranges()
+    for start, stop in [(10, 20), (30, 40), (20, 25), (35, 50), (0, 5), (60, 60)]:
+        ranges.add(start, stop)
+    print(f"Test result: {list(ranges) == [(0, 5), (10, 25), (30, 50)]}")
+
+    # Fragmentation limit
+    ranges = Ranges(limit=4)
+    for i in range(1000):
+        ranges.add(3*i, 3*i+1)
+    print(f"Test result: {len(ranges) == 4 and list(ranges)[0][0] == 0 and list(ranges)[-1][1] == 2998}")
+
+    # Per consumer fetch and clear
+    GSP.mode("server", reset=True)
+    array = Array.from_numpy(np.zeros(100, dtype=np.float32))
+    version, first = array.dirty("gpu")
+    array.set_data(10, np.ones(5, dtype=np.float32))
+    array.set_data(15, np.ones(5, dtype=np.float32))
+    array.set_data(50, np.ones(1, dtype=np.float32))
+    version, second = array.dirty("gpu")
+    _, third = array.dirty("gpu")
+    _, other = array.dirty("other")
+    result = (first == [(0, 100)] and second == [(10, 20), (50, 51)]
+              and third == [] and other == [(0, 100)] and version == 3)
+    print(f"Test result: {result}")
@@ -0,0 +1,45 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import GSP
+import numpy as np
+from array import Array
+from datatype import Datatype
+from canvas import Canvas
+from viewport import Viewport
+from transform_matrix import TransformMatrix
+from dispatch import Dispatcher
+
+if __name__ == '__main__':
+
+    GSP.mode("client", reset=True, output=False)
+    # ------------------------------------------
+    canvas = Canvas(512, 512, 100, 1, False)
+    canvas.set_size(256, 256)
+    viewport = Viewport(canvas, 0, 0, 256, 256)
+    viewport.set_position(10, 10.5)
+    transform = TransformMatrix.identity()
+    array = Array.from_numpy(np.arange(5, dtype=np.float32))
+    array.set_data(2, np.ones(3, dtype=np.float32).tobytes())
+    client_objects = GSP.objects()
+
+    GSP.mode("server", reset=True)
+    # ------------------------------------------
+    dispatcher = Dispatcher(globals())
+    for command in GSP.commands():
+        dispatcher.process(command)
+    server_objects = GSP.objects()
+
+    print(f"Client: {client_objects}")
+    print(f"Server: {server_objects}")
+    print(f"Test result: {client_objects == server_objects}")
+
+    # Invalid commands go through typeguard
+    command = GSP.commands()[1].replace("height: 256", "height: '256'")
+    try:
+        dispatcher.process(command)
+    except TypeError:
+        print(f"Test result: True")
+    else:
+        print(f"Test result: False")
@@ -0,0 +1,105 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import gc
+import GSP
+import numpy as np
+from array import Array
+from datatype import Datatype
+from array_view import ArrayView
+from canvas import Canvas
+from viewport import Viewport
+import spatial
+
+
+def brute_force(P, x0, y0, x1, y1):
+    return np.flatnonzero((P[:,0] >= x0) & (P[:,0] <= x1) & (P[:,1] >= y0) & (P[:,1] <= y1))
+
+if __name__ == '__main__':
+
+    np.random.seed(1)
+    dtype = np.dtype([("position", np.float32, 3), ("color", np.uint8, 4)])
+    Z = np.zeros(100_000, dtype=dtype)
+    Z["position"] = np.random.normal(0, 0.3, (len(Z), 3))
+    P = Z["position"].astype(np.float64)
+    square = np.array([[100, 100], [300, 100], [300, 300], [100, 300]], dtype=np.float32)
+
+    for format in ("yaml", "binary"):
+        GSP.mode("client", reset=True, output=False, format=format)
+        GSP.Command.commands = []
+        # ------------------------------------------
+        canvas = Canvas(512, 512, 100, 1, False)
+        viewport = Viewport(canvas, 0, 0, 400, 400)
+        array = Array.from_numpy(Z)
+        positions = array["position"]
+        picked = viewport.pick(positions, 200, 200, 3)
+        selected = viewport.select(positions, 100, 100, 300, 300)
+        lassoed = viewport.lasso(positions, square)
+        client = [picked, selected, lassoed]
+
+        GSP.mode("server", reset=True)
+        # ------------------------------------------
+        server = []
+        for command in GSP.commands():
+            result = GSP.process(command, globals(), locals())
+            if result is not None:
+                server.append(result)
+
+        selected = np.frombuffer(selected, dtype=np.uint32)
+        picked = np.frombuffer(picked, dtype=np.uint32)
+        distances = np.hypot(P[:,0], P[:,1]) * 200
+        result = (client == server
+                  and np.array_equal(selected, brute_force(P, -0.5, -0.5, 0.5, 0.5))
+                  and np.array_equal(np.frombuffer(lassoed, dtype=np.uint32), selected)
+                  and np.array_equal(np.sort(picked), np.flatnonzero(distances <= 3))
+                  and np.all(np.diff(distances[picked]) >= 0))
+        print(f"Test result: {result}")
+
+    # Incremental updates
+    GSP.mode("server", reset=True)
+    canvas = Canvas(512, 512, 100, 1, False)
+    viewport = Viewport(canvas, 0, 0, 400, 400)
+    Q = np.random.uniform(-1, 1, (10_000, 2)).astype(np.float32)
+    array = Array.from_numpy(Q)
+    viewport.select(array, 0, 0, 400, 400)
+    results = []
+    for i in range(50):
+        # (some points are moved several times)
+        index = np.random.randint(0, 10 if i % 2 else len(Q))
+        Q[index] = np.random.uniform(-2, 2, 2)
+        array.set_data(2*index, Q[index])
+        x0, y0, x1, y1 = np.random.uniform(0, 400, 4)
+        selected = np.frombuffer(viewport.select(array, x0, y0, x1, y1), dtype=np.uint32)
+        (x0, x1), (y0, y1) = viewport.ndc([x0, x1], [y0, y1])
+        expected = brute_force(Q.astype(np.float64), min(x0, x1), min(y0, y1),
+                               max(x0, x1), max(y0, y1))
+        results.append(np.array_equal(selected, expected))
+    print(f"Test result: {all(results)}")
+
+    # Non convex lasso (star)
+    angles = np.linspace(0, 2*np.pi, 20, endpoint=False)
+    radii = np.where(np.arange(20) % 2, 40, 150)
+    star = np.stack([200 + radii*np.cos(angles), 200 + radii*np.sin(angles)], axis=-1)
+    star = star.astype(np.float32)
+    lassoed = np.frombuffer(viewport.lasso(array, star), dtype=np.uint32)
+    x, y = viewport.ndc(star[:,0], star[:,1])
+    Q = Q.astype(np.float64)
+    expected = np.flatnonzero(spatial.inside(Q[:,0], Q[:,1], np.stack([x, y], axis=-1)))
+    print(f"Test result: {len(expected) > 0 and np.array_equal(lassoed, expected)}")
+
+    # Degenerate requests
+    empty = [viewport.lasso(array, np.zeros(0, dtype=np.float32)),
+             viewport.lasso(array, star[:2]),
+             viewport.lasso(array, np.array([[0, 0], [100, 100], [200, 200]], dtype=np.float32))]
+    array.set_data(34, np.array([0, -0.5], dtype=np.float32))
+    picked = np.frombuffer(viewport.pick(array, 200, 100, 0), dtype=np.uint32)
+    print(f"Test result: {empty == [b''] * 3 and 17 in picked}")
+
+    # Grids of views are untracked when views are collected
+    view = array[100:5000]
+    viewport.select(view, 0, 0, 400, 400)
+    tracked, grids = len(array._dirty), len(spatial.grids)
+    del view
+    gc.collect()
+    print(f"Test result: {len(array._dirty) == tracked - 1 and len(spatial.grids) == grids - 1}")
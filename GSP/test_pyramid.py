@@ -0,0 +1,60 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import GSP
+import numpy as np
+from array import Array
+from datatype import Datatype
+from pyramid import Pyramid
+
+if __name__ == '__main__':
+
+    GSP.mode("server", reset=True)
+    np.random.seed(1)
+    Z = np.random.normal(0, 1, 1_000_000).astype(np.float32)
+    Z[123_457] = 100
+    Z[876_543] = -100
+    array = Array.from_numpy(Z)
+    pyramid = Pyramid(array)
+
+    # Level selection and peaks
+    level, x, mins, maxs = pyramid.select(800)
+    vertices = pyramid.lines(800)
+    result = (len(x) <= 1600 and level > 0 and maxs.max() == 100 and mins.min() == -100
+              and vertices[:,1].max() == 100 and vertices[:,1].min() == -100)
+    level, x, mins, maxs = pyramid.select(800, 1000, 2000)
+    result = result and level == 0 and np.array_equal(mins, Z[1000:2000])
+    level, x, mins, maxs = pyramid.select(800, 100_000, 200_000)
+    result = result and x[0] <= 100_000 and x[-1] + 4**level >= 200_000 and maxs.max() == 100
+    print(f"Test result: {result}")
+
+    # Incremental update
+    computed = pyramid.computed
+    array.set_data(500_000, np.full(10, 1000, dtype=np.float32))
+    array.set_data(123_457, np.zeros(1, dtype=np.float32))
+    _, _, _, maxs = pyramid.select(800)
+    reference = Pyramid(array)
+    reference.update()
+    same = all(np.array_equal(a[0], b[0]) and np.array_equal(a[1], b[1])
+               for a, b in zip(pyramid.levels, reference.levels))
+    result = (same and maxs.max() == 1000 and
+              pyramid.computed - computed < 2*len(pyramid.levels)+10)
+    print(f"Test result: {result}")
+
+    # Field of a structured array
+    Z = np.zeros(10_000, dtype=[("x", np.float32), ("y", np.float32)])
+    Z["y"] = np.sin(np.linspace(0, 100, len(Z)))
+    array = Array.from_numpy(Z)
+    pyramid = Pyramid(array["y"])
+    _, _, mins, maxs = pyramid.select(100)
+    before = maxs.max()
+    array.set_data(5000, np.array([(0, 5)], dtype=Z.dtype))
+    _, _, _, after = pyramid.select(100)
+    print(f"Test result: {np.isclose(before, 1, atol=1e-3) and after.max() == 5}")
+
+    # Vertices are relative to start (float32 cannot represent large indices)
+    array = Array.from_numpy(np.zeros(20_000_000, dtype=np.float32))
+    pyramid = Pyramid(array)
+    vertices = pyramid.lines(800, 18_000_000, 18_000_100)
+    print(f"Test result: {np.array_equal(vertices[:,0], np.arange(100))}")
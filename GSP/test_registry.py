@@ -0,0 +1,54 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import GSP
+import tracemalloc
+import numpy as np
+from array import Array
+from datatype import Datatype
+from array_view import ArrayView
+from canvas import Canvas
+from viewport import Viewport
+from transform_colormap import TransformColormap
+
+def cycle():
+    Z = np.zeros(10_000, dtype=[("x", "f4"), ("y", "f4")])
+    array = Array.from_numpy(Z)
+    colormap = TransformColormap(array["x"], "viridis")
+    array.datatype.destroy()
+
+if __name__ == '__main__':
+
+    GSP.mode("client", reset=True, output=False)
+    # ------------------------------------------
+    canvas = Canvas(512, 512, 100, 1, False)
+    viewport = Viewport(canvas, 0, 0, 512, 512)
+    array = Array.from_numpy(np.zeros(10, dtype=np.float32))
+    print(f"Memory: {GSP.memory()}")
+    canvas.destroy()
+    cycle()
+    client_objects = GSP.objects()
+
+    GSP.mode("server", reset=True)
+    # ------------------------------------------
+    for command in GSP.commands():
+        GSP.process(command, globals(), locals())
+    server_objects = GSP.objects()
+
+    print(f"Client: {client_objects}")
+    print(f"Server: {server_objects}")
+    print(f"Test result: {client_objects == server_objects and len(server_objects) == 2}")
+
+    # Soak test (client side, nothing recorded)
+    # ------------------------------------------
+    GSP.mode("client", reset=True, record=False, output=False)
+    tracemalloc.start()
+    usage = []
+    for i in range(200):
+        cycle()
+        usage.append(tracemalloc.get_traced_memory()[0])
+    tracemalloc.stop()
+    print(f"Memory: {usage[50]/2**10:.1f} KB after 50 cycles, "
+          f"{usage[-1]/2**10:.1f} KB after 200 cycles")
+    print(f"Test result: {usage[-1] - usage[50] < 2**16 and len(GSP.objects()) == 0}")
@@ -0,0 +1,55 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import GSP
+import numpy as np
+from array import Array
+from datatype import Datatype
+from ring_array import RingArray
+
+dtypes = [ np.float32,
+           np.dtype((np.float32, 3)),
+           np.dtype([("t", np.float64), ("value", np.float32, 2), ("flag", np.uint8)]) ]
+
+if __name__ == '__main__':
+
+    for format in ("yaml", "binary"):
+        for dtype in dtypes:
+            GSP.mode("client", reset=True, output=False, format=format)
+            GSP.Command.commands = []
+            # ------------------------------------------
+            ring = RingArray.empty(10, dtype)
+            reference = np.zeros(0, dtype=dtype)
+            results = []
+            index = 0
+            for n in (3, 4, 5, 1, 9, 12, 0, 10, 7):
+                items = np.zeros(n, dtype=dtype)
+                items.view(np.uint8).reshape(n, np.dtype(dtype).itemsize)[:] = \
+                    ((index + np.arange(n)) % 256)[:,None]
+                index += n
+                ring.append(items)
+                reference = np.concatenate([reference, items])[-10:]
+                segments = ring.segments()
+                results.append(np.array_equal(ring.to_numpy().view(np.uint8), reference.view(np.uint8))
+                               and len(segments) <= 2
+                               and all(np.shares_memory(s, ring._array) for s in segments if len(s)))
+            middle = np.concatenate(ring.segments(2, 8))
+            results.append(np.array_equal(middle.view(np.uint8), reference[2:8].view(np.uint8)))
+            client_objects = GSP.objects()
+
+            GSP.mode("server", reset=True)
+            # ------------------------------------------
+            for command in GSP.commands():
+                GSP.process(command, globals(), locals())
+            server_objects = GSP.objects()
+            print(f"Test result: {all(results) and client_objects == server_objects}")
+
+    # Dirty ranges after a wraparound
+    GSP.mode("server", reset=True, format="yaml")
+    ring = RingArray.empty(10, np.dtype((np.float32, 3)))
+    ring.append(np.ones((8, 3), dtype=np.float32))
+    ring.dirty("gpu")
+    ring.append(np.ones((4, 3), dtype=np.float32))
+    _, ranges = ring.dirty("gpu")
+    print(f"Test result: {ranges == [(0, 6), (24, 30)] and ring.head == 2}")
@@ -0,0 +1,108 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import os
+import time
+import GSP
+import tempfile
+import numpy as np
+from array import Array
+import asyncio
+from datatype import Datatype
+from canvas import Canvas
+from viewport import Viewport
+from server import Server, Client, write_message, read_message, CREDITS
+from dispatch import Dispatcher
+
+def record(session, count):
+    """ Record the commands of a client using its own session """
+
+    GSP.session(session)
+    GSP.Command.commands = []
+    canvas = Canvas(512, 512, 100, 1, False)
+    viewport = Viewport(canvas, 0, 0, 512, 512)
+    array = Array.from_numpy(np.zeros(100, dtype=np.float32))
+    for i in range(count):
+        viewport.set_position(i, i)
+        array.set_data(i % 100, np.full(1, i, dtype=np.float32).tobytes())
+    data = array.get_data(0, 100)
+    request = GSP.commands().pop()
+    GSP.session(0)
+    return GSP.commands(), request, data
+
+async def client(path, commands, request, data, credits):
+    client = Client()
+    await client.connect(path)
+    for command in commands:
+        await client.send(command)
+    result = await client.request(request)
+    await client.close()
+    return client.max_inflight <= credits and result == data
+
+async def main(path, sessions, credits):
+    server = Server(globals(), credits=credits, process=Dispatcher(globals()).process)
+    await server.start(path)
+    start = time.perf_counter()
+    results = await asyncio.gather(*[client(path, *session, credits)
+                                     for session in sessions])
+    elapsed = time.perf_counter() - start
+    await server.close()
+    return server.count / elapsed, all(results)
+
+async def failures(path):
+    """ Errors of commands are reported, requests fail when the server
+    closes the connection """
+
+    server = Server(globals())
+    await server.start(path)
+    client = Client()
+    await client.connect(path)
+    await client.send(b"Unknown command")
+    try:
+        await client.request(b"Unknown command")
+        valid = False
+    except RuntimeError:
+        valid = len(client.errors) == 1
+    await client.close()
+    await server.close()
+
+    async def hangup(reader, writer):
+        write_message(writer, b"K", CREDITS.pack(4))
+        await read_message(reader)
+        writer.close()
+    server = await asyncio.start_unix_server(hangup, path)
+    client = Client()
+    await client.connect(path)
+    try:
+        await asyncio.wait_for(client.request(b"Unknown command"), 5)
+        valid = False
+    except ConnectionError:
+        pass
+    await client.close()
+    server.close()
+    await server.wait_closed()
+    return valid
+
+if __name__ == '__main__':
+
+    GSP.mode("client", reset=True, output=False, format="binary")
+    # ------------------------------------------
+    sessions = [record(session, 5000) for session in range(1, 5)]
+    client_objects = dict(GSP.objects())
+
+    GSP.mode("server", reset=True)
+    # ------------------------------------------
+    path = os.path.join(tempfile.gettempdir(), "gsp-server.sock")
+    if os.path.exists(path):
+        os.unlink(path)
+    rate, valid = asyncio.run(main(path, sessions, credits=32))
+    server_objects = GSP.objects()
+    os.unlink(path)
+    failed = asyncio.run(failures(path))
+    GSP.mode("server", reset=True, format="yaml")
+
+    print(f"Throughput: {rate:,.0f} commands/s with {len(sessions)} clients")
+    print(f"Test result: {valid}")
+    print(f"Test result: {client_objects == server_objects}")
+    print(f"Test result: {failed}")
@@ -0,0 +1,42 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import GSP
+import threading
+from viewport import Viewport
+from canvas import Canvas
+
+def producer(session, count):
+    if session is not None:
+        GSP.session(session)
+    for i in range(count):
+        canvas = Canvas(512, 512, 100, 1, False)
+        viewport = Viewport(canvas, 0, 0, 512, 512)
+        viewport.set_position(i, i)
+
+if __name__ == '__main__':
+
+    GSP.mode("client", reset=True, output=False)
+    # ------------------------------------------
+    # 8 threads with their own session and 8 threads sharing session 0
+    threads = [threading.Thread(target=producer, args=(session, 200))
+               for session in list(range(1,9)) + [None]*8]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    client_objects = GSP.objects()
+    sessions = set(id.id >> GSP.Session.bits for id in client_objects.keys())
+    command_ids = set(GSP.Command.read(command)["id"] for command in GSP.commands())
+
+    print(f"Objects: {len(client_objects)}, sessions: {sorted(sessions)}")
+    print(f"Test result: {len(client_objects) == 16*2*200}")
+    print(f"Test result: {len(command_ids) == len(GSP.commands()) == 16*3*200}")
+
+    GSP.mode("server", reset=True)
+    # ------------------------------------------
+    for command in GSP.commands():
+        GSP.process(command, globals(), locals())
+    server_objects = GSP.objects()
+    print(f"Test result: {client_objects == server_objects}")
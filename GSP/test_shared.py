@@ -0,0 +1,79 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import multiprocessing
+import GSP
+import numpy as np
+from array import Array
+from datatype import Datatype
+from shared_array import SharedArray, segments
+from multiprocessing import shared_memory
+
+def server(connection):
+    """ Apply commands received through connection, reply with array sums """
+
+    GSP.mode("server", reset=True)
+    while True:
+        command = connection.recv_bytes()
+        if command == b"quit":
+            break
+        GSP.process(command, globals())
+        arrays = [o for o in GSP.objects().values() if isinstance(o, SharedArray)]
+        connection.send([float(array._array.sum()) for array in arrays])
+
+if __name__ == '__main__':
+
+    GSP.mode("client", reset=True, output=False, format="binary")
+    GSP.Command.commands = []
+    # ------------------------------------------
+    Z = np.arange(1000, dtype=np.float32)
+    array = SharedArray.from_numpy(Z)
+    array.set_data(0, np.ones(10, dtype=np.float32))
+    client_objects = GSP.objects()
+    sizes = [len(command) for command in GSP.commands()]
+
+    GSP.mode("server", reset=True)
+    # ------------------------------------------
+    for command in GSP.commands():
+        GSP.process(command, globals(), locals())
+    server_objects = GSP.objects()
+    print(f"Commands size: {sizes} bytes")
+    print(f"Test result: {client_objects == server_objects and max(sizes) < 256}")
+
+    # Client and server in different processes
+    GSP.mode("client", reset=True, output=False, format="binary")
+    GSP.Command.commands = []
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.get_context("spawn").Process(target=server, args=(child,))
+    process.start()
+    array = SharedArray.from_numpy(np.zeros(1000, dtype=np.float32))
+    sums = []
+    for command in list(GSP.commands()):
+        parent.send_bytes(command)
+        sums.append(parent.recv())
+    array.set_data(0, np.ones(100, dtype=np.float32))
+    parent.send_bytes(GSP.commands()[-1])
+    sums.append(parent.recv())
+    # Sparse update is written once (and not undone by the server)
+    count = len(GSP.commands())
+    Z = array._array.copy()
+    Z[[200, 500, 900]] = 1
+    array.update(Z)
+    for command in GSP.commands()[count:]:
+        parent.send_bytes(command)
+        sums.append(parent.recv())
+    parent.send_bytes(b"quit")
+    process.join()
+    print(f"Test result: {sums[-2:] == [[100.0], [103.0]] and process.exitcode == 0}")
+
+    # Segment is removed when the array is destroyed
+    name = array.segment
+    array.destroy()
+    try:
+        shared_memory.SharedMemory(name=name)
+        removed = False
+    except FileNotFoundError:
+        removed = True
+    print(f"Test result: {removed and name not in segments}")
+    GSP.mode("server", reset=True, format="yaml")
@@ -0,0 +1,92 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import os
+import time
+import GSP
+import tempfile
+import snapshot
+import numpy as np
+from array import Array
+from datatype import Datatype
+from array_view import ArrayView
+from canvas import Canvas
+from viewport import Viewport
+from transform_matrix import TransformMatrix
+from transform_colormap import TransformColormap
+
+def replay(commands):
+    start = time.perf_counter()
+    for command in commands:
+        GSP.process(command, globals(), locals())
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+
+    GSP.mode("client", reset=True, output=False, format="binary")
+    # ------------------------------------------
+    canvas = Canvas(512, 512, 100, 1, False)
+    viewport = Viewport(canvas, 0, 0, 512, 512)
+    transform = TransformMatrix.identity()
+    Z = np.zeros(1000, dtype=[("position", "f4", 3), ("value", "f4")])
+    points = Array.from_numpy(Z)
+    colormap = TransformColormap(points["value"], "viridis")
+    other = Array.from_numpy(np.zeros(1000, dtype=np.uint8))
+    for i in range(500):
+        canvas.set_size(512+i, 512+i)
+        viewport.set_position(i, i)
+        transform.set_data(np.eye(4, dtype=np.float32).ravel().tobytes())
+        points.set_data(2*i, np.full(2, i, dtype=Z.dtype).tobytes())
+    other.destroy()
+    for i in range(500):
+        points.set_data(i, np.full(1, -i, dtype=Z.dtype).tobytes())
+    commands = GSP.commands()
+    head, tail = commands[:len(commands)//2], commands[len(commands)//2:]
+
+    GSP.mode("server", reset=True)
+    # ------------------------------------------
+    elapsed = replay(commands)
+    full_objects = GSP.objects()
+    print(f"Full replay:        {len(commands)} commands, {1000*elapsed:.1f} ms")
+
+    GSP.mode("server", reset=True)
+    replay(head)
+    filename = os.path.join(tempfile.gettempdir(), "gsp-snapshot.bin")
+    snapshot.save(filename)
+
+    GSP.mode("server", reset=True)
+    start = time.perf_counter()
+    snapshot.load(filename, globals())
+    elapsed = time.perf_counter() - start + replay(tail)
+    print(f"Snapshot + tail:    {len(tail)} commands, {1000*elapsed:.1f} ms")
+    print(f"Test result: {GSP.objects() == full_objects}")
+
+    GSP.mode("server", reset=True)
+    compacted = snapshot.compact(commands)
+    elapsed = replay(compacted)
+    print(f"Compacted replay:   {len(compacted)} commands, {1000*elapsed:.1f} ms")
+    print(f"Test result: {GSP.objects() == full_objects}")
+
+    # Requests are not part of the compacted log, nor are the commands
+    # referencing destroyed objects
+    GSP.mode("client", reset=True, output=False, format="binary")
+    GSP.Command.commands = []
+    canvas = Canvas(512, 512, 100, 1, False)
+    viewport = Viewport(canvas, 0, 0, 512, 512)
+    viewport.set_position(10, 10)
+    positions = Array.from_numpy(np.random.uniform(-1, 1, (100, 2)).astype(np.float32))
+    viewport.pick(positions, 256, 256, 100)
+    other = Array.from_numpy(np.random.uniform(-1, 1, (100, 2)).astype(np.float32))
+    viewport.select(other, 0, 0, 512, 512)
+    other.destroy()
+    client_objects = GSP.objects()
+    GSP.mode("server", reset=True)
+    compacted = snapshot.compact(GSP.commands())
+    methods = [GSP.Command.read(command)["method"] for command in compacted]
+    for command in compacted:
+        GSP.process(command, globals(), locals())
+    result = (methods == ["Canvas", "Viewport", "Datatype", "Array", "Datatype"]
+              and GSP.objects() == client_objects)
+    print(f"Test result: {result}")
+    GSP.mode("server", reset=True, format="yaml")
@@ -0,0 +1,52 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import io
+import os
+import GSP
+import tempfile
+import numpy as np
+from array import Array
+from datatype import Datatype
+from canvas import Canvas
+from viewport import Viewport
+
+if __name__ == '__main__':
+
+    for format in ("yaml", "binary"):
+        GSP.mode("client", reset=True, output=False, format=format)
+        GSP.Command.commands = []
+        # ------------------------------------------
+        canvas = Canvas(512, 512, 100, 1, False)
+        viewport = Viewport(canvas, 0, 0, 512, 512)
+        array = Array.from_numpy(np.arange(100, dtype=np.float32))
+        for i in range(100):
+            canvas.set_size(512+i, 512+i)
+            array.set_data(i, np.ones(1, dtype=np.float32).tobytes())
+        client_objects = GSP.objects()
+
+        filename = os.path.join(tempfile.gettempdir(), "gsp-stream." + format)
+        with open(filename, "wb") as file:
+            for command in GSP.commands():
+                file.write(command if format == "binary" else command.encode())
+
+        GSP.mode("server", reset=True)
+        # ------------------------------------------
+        reports = []
+        GSP.process_stream(filename, globals(), progress=reports.append, interval=50)
+        server_objects = GSP.objects()
+
+        print(f"{format}: {reports[-1]}")
+        print(f"Test result: {client_objects == server_objects}")
+
+    # Truncated frames (in the prefix or in the payload) are errors
+    frames = b"".join(GSP.commands())
+    errors = []
+    for size in (len(frames) - 3, len(frames) - len(GSP.commands()[-1]) + 5):
+        try:
+            list(GSP.iterframes(io.BytesIO(frames[:size])))
+        except ValueError as error:
+            errors.append(str(error))
+    print(f"Test result: {errors == ['Truncated frame', 'Truncated frame prefix']}")
+    GSP.mode("server", reset=True, format="yaml")
@@ -0,0 +1,82 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import GSP
+import numpy as np
+from array import Array
+from datatype import Datatype
+from transform_matrix import TransformMatrix
+from transform_chain import TransformChain
+
+
+def translate(x, y, z):
+    M = np.eye(4, dtype=np.float32)
+    M[:3, 3] = x, y, z
+    return M
+
+def scale(s):
+    return np.diag([s, s, s, 1]).astype(np.float32)
+
+def rotate(angle):
+    c, s = np.cos(angle), np.sin(angle)
+    M = np.eye(4, dtype=np.float32)
+    M[:2, :2] = [[c, -s], [s, c]]
+    return M
+
+if __name__ == '__main__':
+
+    for format in ("yaml", "binary"):
+        GSP.mode("client", reset=True, output=False, format=format)
+        GSP.Command.commands = []
+        # ------------------------------------------
+        T = TransformMatrix(translate(1, 2, 3))
+        S = TransformMatrix(scale(2))
+        R = TransformMatrix(rotate(np.pi/2))
+        inner = TransformChain([S, R])
+        chain = TransformChain([T, inner])
+        T.set_data(translate(1, 0, 0))
+        client_objects = GSP.objects()
+
+        GSP.mode("server", reset=True)
+        # ------------------------------------------
+        for command in GSP.commands():
+            GSP.process(command, globals(), locals())
+        server_objects = GSP.objects()
+        expected = rotate(np.pi/2) @ scale(2) @ translate(1, 0, 0)
+        result = np.allclose(server_objects[chain.id].matrix(), expected, atol=1e-6)
+        print(f"Test result: {result and client_objects == server_objects}")
+
+    # Cache invalidation and application
+    GSP.mode("server", reset=True)
+    T = TransformMatrix(translate(1, 2, 3))
+    S = TransformMatrix(scale(2))
+    chain = TransformChain([T, S])
+    first = chain.matrix()
+    cached = chain.matrix() is first
+    version = chain.version()
+    S.set_data(scale(3))
+    second = chain.matrix()
+    P = np.random.uniform(-1, 1, (1000, 3)).astype(np.float32)
+    positions = Array.from_numpy(P)
+    out = chain.apply(positions)
+    reused = chain.apply(positions) is out
+    expected = 3*(P + [1, 2, 3])
+    result = (cached and second is not first and chain.version() > version
+              and np.allclose(second, scale(3) @ translate(1, 2, 3))
+              and reused and np.allclose(out, expected, atol=1e-5))
+    print(f"Test result: {result}")
+
+    # Perspective division
+    M = np.eye(4, dtype=np.float32)
+    M[3] = 0, 0, 1, 0
+    out = TransformMatrix(M).apply(P)
+    print(f"Test result: {np.allclose(out, P / P[:, 2:3], atol=1e-4)}")
+
+    # Structured positions (packed fields, and position field before others)
+    Z = np.zeros(1000, dtype=[("x", "f4"), ("y", "f4"), ("z", "f4")])
+    Z["x"], Z["y"], Z["z"] = P.T
+    V = np.zeros(1000, dtype=[("position", "f4", 3), ("color", "u1", 4)])
+    V["position"] = P
+    outs = [chain.apply(Array.from_numpy(Z)).copy(), chain.apply(Array.from_numpy(V)).copy()]
+    print(f"Test result: {all(np.allclose(out, 3*(P + [1, 2, 3]), atol=1e-5) for out in outs)}")
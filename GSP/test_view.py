@@ -0,0 +1,84 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import gc
+import GSP
+import numpy as np
+from array import Array
+from datatype import Datatype
+from ring_array import RingArray
+from array_view import ArrayView
+from array_slice import ArraySlice
+
+dtype = np.dtype([("position", np.float32, 3), ("color", np.uint8, 4)])
+
+if __name__ == '__main__':
+
+    for format in ("yaml", "binary"):
+        GSP.mode("client", reset=True, output=False, format=format)
+        GSP.Command.commands = []
+        # ------------------------------------------
+        Z = np.zeros(20, dtype=dtype)
+        Z["position"] = np.arange(60).reshape(20, 3)
+        array = Array.from_numpy(Z)
+        position = array["position"]
+        strided = array[2:18:3]
+        nested = strided["position"][1:4]
+        results = []
+        for view, expected in ((position, Z["position"]),
+                               (strided, Z[2:18:3]),
+                               (nested, Z["position"][2:18:3][1:4])):
+            data = view.data()
+            results.append(np.array_equal(data, expected)
+                           and np.shares_memory(data, array._array))
+        client_objects = GSP.objects()
+
+        GSP.mode("server", reset=True)
+        # ------------------------------------------
+        for command in GSP.commands():
+            GSP.process(command, globals(), locals())
+        server_objects = GSP.objects()
+        nested = server_objects[nested.id]
+        results.append(np.array_equal(nested.data(), Z["position"][2:18:3][1:4]))
+        print(f"Test result: {all(results) and client_objects == server_objects}")
+
+    # Dirty ranges propagation (items 5, 8 and 11 are in nested)
+    GSP.mode("server", reset=True)
+    array = Array.from_numpy(np.zeros(20, dtype=dtype))
+    nested = array[2:18:3]["position"][1:4]
+    _, first = nested.dirty("gpu")
+    array.set_data(8, np.ones(1, dtype=dtype))
+    array.set_data(12, np.ones(2, dtype=dtype))
+    _, second = nested.dirty("gpu")
+    array.set_data(0, np.ones(5, dtype=dtype))
+    _, third = nested.dirty("gpu")
+    _, fourth = array.dirty("gpu")
+    result = (first == [(0, 3)] and second == [(1, 2)] and third == []
+              and fourth == [(0, 20)])
+    print(f"Test result: {result}")
+
+    # Views of a ring array (logical order)
+    ring = RingArray.empty(8, np.dtype((np.float32, 2)))
+    items = np.arange(20, dtype=np.float32).reshape(10, 2)
+    ring.append(items[:6])
+    ring.append(items[6:])
+    view = ring[1:7]
+    segments = view.segments()
+    reference = items[2:][1:7]
+    result = (len(segments) == 2 and np.array_equal(view.data(), reference)
+              and all(np.shares_memory(s, ring._array) for s in segments))
+    view.dirty("gpu")
+    ring.append(np.ones((1, 2), dtype=np.float32))
+    _, moved = view.dirty("gpu")
+    print(f"Test result: {result and moved == [(0, 6)]}")
+
+    # Consumers of views are untracked when the view is released or collected
+    array = Array.from_numpy(np.zeros(20, dtype=dtype))
+    first, second = array[2:10], array[5:]["position"]
+    first.dirty("gpu"), second.dirty("gpu"), second.dirty("cpu")
+    tracked = len(array._dirty)
+    first.destroy()
+    del second
+    gc.collect()
+    print(f"Test result: {tracked == 3 and array._dirty == {}}")
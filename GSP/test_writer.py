@@ -0,0 +1,41 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import io
+import time
+import GSP
+from array import Array
+from canvas import Canvas
+from writer import Writer
+
+class SlowSink(io.StringIO):
+    """ Sink that takes some time for each write """
+
+    def write(self, text):
+        time.sleep(0.001)
+        return io.StringIO.write(self, text)
+
+def produce(writer, count):
+    GSP.mode("client", reset=True, output=True, writer=writer)
+    GSP.Command.commands = []
+    canvas = Canvas(512, 512, 100, 1, False)
+    for i in range(count):
+        canvas.set_size(i, i)
+    writer.close()
+    GSP.mode("client", reset=False, writer=None)
+    return "".join(GSP.commands())
+
+if __name__ == '__main__':
+
+    for policy in ("block", "spill", "drop"):
+        writer = Writer(SlowSink(), maxsize=16, batch=4, policy=policy)
+        commands = produce(writer, 1000)
+        output = writer.sink.getvalue()
+        print(f"{policy:>5}: written {writer.written}, "
+              f"spilled {writer.spilled}, dropped {writer.dropped}")
+        if policy == "drop":
+            print(f"Test result: {writer.dropped > 0 and commands.endswith(output[-1000:])}")
+        else:
+            print(f"Test result: {output == commands}")
+    GSP.mode("server", reset=True)
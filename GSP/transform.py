@@ -12,6 +12,12 @@ class Transform(Object):
     def __init__(self):
         Object.__init__(self)
 
+    # Convenience method, not part of the protocol
+    def version(self):
+        """ Number that increases whenever the transform is modified """
+
+        return 0
+
     def __repr__(self):
         return f"Transform [id={self.id}]"
 
@@ -0,0 +1,65 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import numpy as np
+from typing import Union
+from GSP import OID, Object, command
+from typeguard import typechecked
+from transform import Transform
+from transform_matrix import TransformMatrix
+
+class TransformChain(Transform):
+    """ Composition of matrix transforms (or chains), the first one being
+    applied first. The product of the matrices is cached and only computed
+    again when one of them has been modified. """
+
+    @typechecked
+    @command("")
+    def __init__(self, transforms : list):
+        Transform.__init__(self)
+        for transform in transforms:
+            if not isinstance(transform, (TransformMatrix, TransformChain)):
+                raise ValueError(f"Cannot chain {type(transform).__name__} transforms")
+        self.transforms = transforms
+        self._matrix = None
+        self._cached = None
+        self._out = None
+
+    # Convenience method, not part of the protocol
+    def version(self):
+        # Member versions only increase, hence so does their sum
+        return sum(transform.version() for transform in self.transforms)
+
+    # Convenience method, not part of the protocol
+    def matrix(self):
+        """ Product of the member matrices (cached) """
+
+        versions = [(id(transform), transform.version()) for transform in self.transforms]
+        if self._matrix is None or versions != self._cached:
+            matrix = np.eye(4, dtype=np.float64)
+            for transform in self.transforms:
+                matrix = transform.matrix().astype(np.float64) @ matrix
+            self._matrix = matrix.astype(np.float32)
+            self._cached = versions
+        return self._matrix
+
+    # Convenience method, not part of the protocol
+    apply = TransformMatrix.apply
+
+    def __getstate__(self):
+        return { "id" : self.id, "transforms" : self.transforms }
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+        self._matrix = None
+        self._cached = None
+        self._out = None
+
+    def __eq__(self, other):
+        return type(self) == type(other) and self.transforms == other.transforms
+
+    def __repr__(self):
+        ids = ", ".join(str(transform.id) for transform in self.transforms)
+        return f"Transform[Chain] [id={self.id}]: [{ids}]"
@@ -9,20 +9,88 @@ from typeguard import typechecked
 from array import Array
 from array_view import ArrayView
 from transform import Transform
+from view import View
+import colormaps
 
 class TransformColormap(Transform):
 
     @typechecked
     @command("")
-    def __init__(self, values : Union[Array, ArrayView],
+    def __init__(self, values : Union[Array, View],
                        colormap : str):
         Transform.__init__(self)
         self.values = values
         self.colormap = colormap
+        self._cached = None
+        self._out = None
+        self._colors = None
+        self._indices = None
+        self._scratch = None
+
+    # Convenience method, not part of the protocol
+    def version(self):
+        root = self.values.root() if isinstance(self.values, View) else self.values
+        return root._version
+
+    # Convenience method, not part of the protocol
+    def apply(self, vmin=None, vmax=None, size=256):
+        """ (n, 4) uint8 RGBA colors of the values, normalized to [vmin, vmax]
+        (their min and max by default) and looked up in a table of size
+        entries. The result is a read only view of a buffer reused between
+        calls and is only computed again when the values, parameters or
+        colormaps change.
+
+        Without an explicit range, uint8 values index a 256 entries table
+        directly. """
+
+        key = (self.version(), colormaps.version, self.colormap.lower(), vmin, vmax, size)
+        if key == self._cached:
+            return self._colors
+        values = self.values.data() if isinstance(self.values, View) else self.values._array
+        values = values.reshape(-1)
+        table = colormaps.lut(self.colormap, size)
+        n = len(values)
+        if self._out is None or len(self._out) != n:
+            self._out = np.empty((n, 4), dtype=np.uint8)
+            self._colors = self._out.view()
+            self._colors.flags.writeable = False
+            self._indices = np.empty(n, dtype=np.intp)
+            self._scratch = np.empty(n, dtype=np.float32)
+        if values.dtype == np.uint8 and size == 256 and (vmin, vmax) in ((None, None), (0, 255)):
+            # Values are indices already
+            indices = values
+        else:
+            lo = np.fmin.reduce(values) if vmin is None else vmin
+            hi = np.fmax.reduce(values) if vmax is None else vmax
+            scale = (size - 1) / (hi - lo) if hi != lo else 0
+            # Nearest entry, NaN being mapped to the first one
+            scratch = self._scratch
+            np.subtract(values, lo, out=scratch, casting="unsafe")
+            np.multiply(scratch, scale, out=scratch, casting="unsafe")
+            np.add(scratch, 0.5, out=scratch)
+            np.fmax(scratch, 0, out=scratch)
+            np.fmin(scratch, size - 1, out=scratch)
+            indices = self._indices
+            indices[...] = scratch
+        np.take(table, indices, axis=0, out=self._out, mode="clip")
+        self._cached = key
+        return self._colors
+
+    def __getstate__(self):
+        return { "id" : self.id, "values" : self.values, "colormap" : self.colormap }
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+        self._cached = None
+        self._out = None
+        self._colors = None
+        self._indices = None
+        self._scratch = None
+
+    def __eq__(self, other):
+        return (type(self) == type(other) and self.values == other.values
+                and self.colormap == other.colormap)
 
     def __repr__(self):
         return f"Transform[Colormap] [id={self.id}]: {self.colormap}({self.values.id})"
-        
-
-    
-    
@@ -3,10 +3,31 @@
 # Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
 # -----------------------------------------------------------------------------
 import numpy as np
+from numpy.lib.recfunctions import structured_to_unstructured
 from typing import Union
-from GSP import OID, Object, command
+from GSP import OID, Object, Bytes, command, _buffer
 from typeguard import typechecked
 from transform import Transform
+from view import View
+
+def apply(matrix, points, out=None):
+    """ Apply a 4x4 matrix to (n, 3) points (as column vectors, with a
+    perspective division if the last row of the matrix is not 0,0,0,1) """
+
+    points = np.asarray(points)
+    if points.dtype.names:
+        # Components of structured points (a view when fields are packed)
+        points = structured_to_unstructured(points)
+    points = points.reshape(len(points), -1)
+    if out is None:
+        out = np.empty((len(points), 3), dtype=np.float32)
+    np.matmul(points[:, :3], matrix[:3, :3].T, out=out)
+    out += matrix[:3, 3]
+    if not np.array_equal(matrix[3], [0, 0, 0, 1]):
+        w = points[:, :3] @ matrix[3, :3] + matrix[3, 3]
+        out /= w[:, None]
+    return out
+
 
 class TransformMatrix(Transform):
 
@@ -18,17 +39,53 @@ class TransformMatrix(Transform):
     
     @typechecked
     @command("")
-    def __init__(self, data : bytes):
+    def __init__(self, data : Bytes):
         Transform.__init__(self)
         self.dtype = "f4"
-        self.data = data
-        self._array = np.frombuffer(data, dtype=self.dtype).copy()
+        self._array = np.frombuffer(_buffer(data), dtype=self.dtype).copy()
+        self._version = 0
+        self._out = None
 
     @typechecked
-    @command("set_data")
-    def set_data(self, data: bytes ):
-        data = np.frombuffer(data, dtype=self._array.dtype)
+    @command("set_data", coalesce="replace")
+    def set_data(self, data: Bytes ):
+        data = np.frombuffer(_buffer(data), dtype=self._array.dtype)
         self._array.ravel()[:] = data
+        self._version += 1
+
+    # Convenience method, not part of the protocol
+    def version(self):
+        return self._version
+
+    # Convenience method, not part of the protocol
+    def matrix(self):
+        """ 4x4 matrix (applied to column vectors) """
+
+        return self._array.reshape(4, 4)
+
+    # Convenience method, not part of the protocol
+    def apply(self, positions, out=None):
+        """ Transformed (n, 3) positions (numpy array, Array or view),
+        written in out or in a buffer reused between calls """
+
+        if not isinstance(positions, np.ndarray):
+            positions = positions.data() if isinstance(positions, View) else positions._array
+        if out is None:
+            if self._out is None or len(self._out) != len(positions):
+                self._out = np.empty((len(positions), 3), dtype=np.float32)
+            out = self._out
+        return apply(self.matrix(), positions, out)
+
+    def __getstate__(self):
+        state = dict(vars(self))
+        del state["_out"]
+        return state
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+        self._version = state.get("_version", 0)
+        self._out = None
 
     def __repr__(self):
         return f"Transform[Matrix] [id={self.id}]: {self.dtype}, {self._array}"
@@ -0,0 +1,154 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import weakref
+import numpy as np
+from abc import ABCMeta, abstractmethod
+from GSP import Object
+from ring_array import RingArray
+
+
+class View(Object, metaclass=ABCMeta):
+    """ Base class of array views (ArrayView and ArraySlice). A view refers
+    to an array or to another view and is resolved to numpy views of the
+    underlying array data, without copy.
+
+    Items are indexed along the first dimension of the array, in logical
+    order for ring arrays (oldest first). """
+
+    # Convenience method, not part of the protocol
+    def root(self):
+        """ Array the view (eventually) refers to """
+
+        array = self.array
+        while isinstance(array, View):
+            array = array.array
+        return array
+
+    # Convenience method, not part of the protocol
+    def segments(self):
+        """ Numpy views of the view items, a single one unless the view
+        spans the wraparound of a ring array """
+
+        if isinstance(self.array, View):
+            segments = self.array.segments()
+        elif isinstance(self.array, RingArray):
+            segments = self.array.segments()
+        else:
+            segments = [self.array._array]
+        return self.select(segments)
+
+    # Convenience method, not part of the protocol
+    def data(self):
+        """ View items as a numpy view (or as a copy if the view spans the
+        wraparound of a ring array) """
+
+        segments = self.segments()
+        if len(segments) == 1:
+            return segments[0]
+        return np.concatenate(segments)
+
+    # Convenience method, not part of the protocol
+    def dirty(self, consumer, clear=True):
+        """ Return the version of the array and the (start, stop) item ranges
+        of the view modified since the last call by consumer. Everything is
+        dirty for a new consumer, which is tracked until untracked or until
+        the view is released. """
+
+        array = self.root()
+        key = (id(self), consumer)
+        if key not in array._dirty:
+            weakref.finalize(self, array.untrack, key)
+        version, ranges = array.dirty(key, clear)
+        size = max(1, int(np.prod(array._array.shape[1:])))
+        starts = [start // size for start, stop in ranges]
+        stops = [-(-stop // size) for start, stop in ranges]
+        if isinstance(array, RingArray):
+            state = (array.head, array.count)
+            if self._heads.get(consumer, state) != state:
+                # Items have moved in logical order
+                starts, stops = [0], [array.count]
+            else:
+                capacity = len(array._array)
+                first = (array.head - array.count) % capacity
+                starts, stops = self.unwrap(starts, stops, first, capacity, array.count)
+            if clear:
+                self._heads[consumer] = state
+        views = [self]
+        while isinstance(views[-1].array, View):
+            views.append(views[-1].array)
+        for view in reversed(views):
+            starts, stops = view.map(starts, stops)
+        return version, list(zip(starts, stops))
+
+    # Convenience method, not part of the protocol
+    def untrack(self, consumer):
+        """ Stop tracking modifications for consumer """
+
+        self.root().untrack((id(self), consumer))
+        self._heads.pop(consumer, None)
+
+    # Convenience method, not part of the protocol
+    def release(self):
+        array = self.root()
+        for key in [key for key in array._dirty if isinstance(key, tuple) and key[0] == id(self)]:
+            array.untrack(key)
+        self._heads = {}
+        Object.release(self)
+
+    @staticmethod
+    def length(array):
+        """ Number of items of an array or of a view """
+
+        if isinstance(array, View):
+            return sum(len(segment) for segment in array.segments())
+        if isinstance(array, RingArray):
+            return array.count
+        return len(array._array)
+
+    @staticmethod
+    def unwrap(starts, stops, first, capacity, count):
+        """ Convert storage item ranges of a ring array to logical ranges """
+
+        ranges = []
+        for start, stop in zip(starts, stops):
+            start, stop = (start - first) % capacity, (stop - first - 1) % capacity + 1
+            if stop <= start:
+                ranges += [(start, capacity), (0, stop)]
+            else:
+                ranges.append((start, stop))
+        ranges = sorted((start, min(stop, count)) for start, stop in ranges if start < count)
+        return [start for start, stop in ranges], [stop for start, stop in ranges]
+
+    @abstractmethod
+    def select(self, segments):
+        """ Items of the view given the segments of the viewed items """
+
+    @abstractmethod
+    def map(self, starts, stops):
+        """ Item ranges of the view given ranges of the viewed items """
+
+    # Convenience method, not part of the protocol
+    def __getitem__(self, key):
+        import array_view, array_slice
+        if isinstance(key, slice):
+            start, stop, step = key.indices(View.length(self))
+            return array_slice.ArraySlice(self, start, stop, step)
+        return array_view.ArrayView(self, key)
+
+    def __getstate__(self):
+        state = dict(vars(self))
+        del state["_heads"]
+        return state
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+        self._heads = {}
+
+    def __eq__(self, other):
+        if not type(self) == type(other):
+            return False
+        return all(getattr(self, key) == getattr(other, key)
+                   for key in vars(self) if key not in ("id", "_heads"))
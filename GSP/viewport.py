@@ -2,10 +2,14 @@
 # Graphic Server Protocol (GSP) — reference implementation
 # Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
 # -----------------------------------------------------------------------------
+import numpy as np
 from typing import Union
-from GSP import OID, Object, command
+from GSP import OID, Object, Bytes, command, _buffer
+from array import Array
 from typeguard import typechecked
 from canvas import Canvas
+from view import View
+import spatial
 
 class Viewport(Object):
 
@@ -24,18 +28,61 @@ class Viewport(Object):
         self.height = height
 
     @typechecked
-    @command("set_position")
+    @command("set_position", coalesce="replace")
     def set_position(self, x : Union[int,float],
                            y : Union[int,float]):
         self.x = x
         self.y = y
 
     @typechecked
-    @command("set_size")
+    @command("set_size", coalesce="replace")
     def set_size(self, width :  Union[int,float],
                        height : Union[int,float]):
         self.width = width
         self.height = height
-        
+
+    # Convenience method, not part of the protocol
+    def ndc(self, x, y):
+        """ Normalized device coordinates of canvas pixel coordinates """
+
+        return ((np.asarray(x, dtype=np.float64) - self.x) / self.width * 2 - 1,
+                (np.asarray(y, dtype=np.float64) - self.y) / self.height * 2 - 1)
+
+    @typechecked
+    @command("pick", request=True)
+    def pick(self, positions : Union[Array, View],
+                   x :         Union[int,float],
+                   y :         Union[int,float],
+                   radius :    Union[int,float]) -> bytes:
+        """ Indices (uint32) of the positions (in normalized device
+        coordinates) within radius pixels of (x, y), nearest first """
+
+        x, y = self.ndc(x, y)
+        rx, ry = 2*radius / self.width, 2*radius / self.height
+        return spatial.disc(positions, x, y, rx, ry).astype(np.uint32).tobytes()
+
+    @typechecked
+    @command("select", request=True)
+    def select(self, positions : Union[Array, View],
+                     x0 :        Union[int,float],
+                     y0 :        Union[int,float],
+                     x1 :        Union[int,float],
+                     y1 :        Union[int,float]) -> bytes:
+        """ Indices (uint32) of the positions inside the pixel rectangle """
+
+        (x0, x1), (y0, y1) = self.ndc([x0, x1], [y0, y1])
+        return spatial.rectangle(positions, x0, y0, x1, y1).astype(np.uint32).tobytes()
+
+    @typechecked
+    @command("lasso", request=True)
+    def lasso(self, positions : Union[Array, View],
+                    polygon :   Bytes) -> bytes:
+        """ Indices (uint32) of the positions inside the polygon given as
+        float32 (x, y) pixel coordinates """
+
+        vertices = np.frombuffer(_buffer(polygon), dtype=np.float32).reshape(-1, 2)
+        vertices = np.stack(self.ndc(vertices[:,0], vertices[:,1]), axis=-1)
+        return spatial.polygon(positions, vertices).astype(np.uint32).tobytes()
+
     def __repr__(self):
         return f"Viewport [id={self.id}]: {self.x},{self.y},{self.width},{self.height}"
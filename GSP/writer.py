@@ -0,0 +1,141 @@
+# -----------------------------------------------------------------------------
+# Graphic Server Protocol (GSP) — reference implementation
+# Copyright 2022 Nicolas P. Rougier - BSD 2 Clauses licence
+# -----------------------------------------------------------------------------
+import atexit
+import struct
+import tempfile
+import threading
+import collections
+
+# Spill records: type ("s" for str, "b" for bytes) | size (u64) | content
+RECORD = struct.Struct("<cQ")
+
+
+class Writer:
+    """ Background writer with a bounded queue and batched writes to any
+    file-like sink (commands may be str or bytes).
+
+    When the queue is full, the policy tells what to do:
+    - "block": wait for the writer thread to make room
+    - "drop": drop the oldest queued command
+    - "spill": append commands to a temporary file until the writer thread
+      catches up (order is preserved) """
+
+    def __init__(self, sink, maxsize=1024, batch=256, policy="block"):
+        if policy not in ("block", "drop", "spill"):
+            raise ValueError(f"Unknown policy '{policy}'")
+        self.sink = sink
+        self.maxsize = maxsize
+        self.batch = batch
+        self.policy = policy
+        self.queue = collections.deque()
+        self.condition = threading.Condition()
+        self.spill = None
+        self.busy = False
+        self.closed = False
+        self.dropped = 0
+        self.spilled = 0
+        self.written = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def write(self, command):
+        """ Queue a command (never blocks unless policy is "block") """
+
+        with self.condition:
+            if self.closed:
+                raise ValueError("Writer is closed")
+            if self.spill is not None or len(self.queue) >= self.maxsize:
+                if self.policy == "block":
+                    self.condition.wait_for(lambda: len(self.queue) < self.maxsize)
+                elif self.policy == "drop":
+                    self.queue.popleft()
+                    self.dropped += 1
+                else:
+                    if self.spill is None:
+                        self.spill = tempfile.TemporaryFile()
+                    kind = b"s" if isinstance(command, str) else b"b"
+                    content = command.encode() if kind == b"s" else command
+                    self.spill.write(RECORD.pack(kind, len(content)))
+                    self.spill.write(content)
+                    self.spilled += 1
+                    return
+            self.queue.append(command)
+            self.condition.notify_all()
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.queue or self.spill is not None or self.closed)
+                if not self.queue and self.spill is None:
+                    break
+                count = min(self.batch, len(self.queue))
+                commands = [self.queue.popleft() for i in range(count)]
+                spill = None
+                if not commands:
+                    spill, self.spill = self.spill, None
+                self.busy = True
+                self.condition.notify_all()
+            if commands:
+                self.output(commands)
+            else:
+                self.unspill(spill)
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
+        self.sink.flush()
+
+    def unspill(self, spill):
+        """ Write the content of a spill file, by batches """
+
+        spill.seek(0)
+        commands = []
+        while True:
+            record = spill.read(RECORD.size)
+            if not record:
+                break
+            kind, size = RECORD.unpack(record)
+            content = spill.read(size)
+            commands.append(content.decode() if kind == b"s" else content)
+            if len(commands) >= self.batch:
+                self.output(commands)
+                commands = []
+        if commands:
+            self.output(commands)
+        spill.close()
+
+    def output(self, commands):
+        """ Write a batch of commands to the sink in as few calls as possible """
+
+        start = 0
+        for stop in range(1, len(commands)+1):
+            if stop == len(commands) or type(commands[stop]) != type(commands[start]):
+                if isinstance(commands[start], str):
+                    self.sink.write("".join(commands[start:stop]))
+                else:
+                    sink = getattr(self.sink, "buffer", self.sink)
+                    if sink is not self.sink:
+                        # Pending text must reach the buffer before the frames
+                        self.sink.flush()
+                    sink.write(b"".join(commands[start:stop]))
+                start = stop
+        self.written += len(commands)
+
+    def flush(self):
+        """ Wait until all queued commands have been written """
+
+        with self.condition:
+            self.condition.wait_for(lambda: not self.queue and self.spill is None and not self.busy)
+
+    def close(self):
+        """ Write remaining commands and stop the writer thread """
+
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        atexit.unregister(self.close)
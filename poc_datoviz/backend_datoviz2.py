@@ -3,7 +3,9 @@
 # -------------------------------------------------------------------------------------------------
 
 import io
+import itertools
 import logging
+from collections import OrderedDict
 from pathlib import Path
 from pprint import pprint
 import re
@@ -14,6 +16,8 @@ from matplotlib.colors import hsv_to_rgb
 
 import datoviz as dvz
 
+from executor import Executor
+
 
 # -------------------------------------------------------------------------------------------------
 # Logger
@@ -74,6 +78,61 @@ YAML_PATH = ROOT_DIR / 'research/example_transforms.yaml'
 VERTEX_DAT_ID = 100
 
 
+# -------------------------------------------------------------------------------------------------
+# Memoization
+# -------------------------------------------------------------------------------------------------
+
+# Versions of arrays and transforms, unique across renderers so that memo keys never collide.
+_versions = itertools.count(1)
+
+
+class Memo:
+    """LRU cache of numpy results whose total size is capped to `capacity` bytes."""
+
+    def __init__(self, capacity=256 * 1024 * 1024):
+        self.capacity = capacity
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if key in self._items:
+            self.nbytes -= self._items.pop(key).nbytes
+        if value.nbytes > self.capacity:
+            return
+        self._items[key] = value
+        self.nbytes += value.nbytes
+        while self.nbytes > self.capacity:
+            _, evicted = self._items.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        self._items.clear()
+        self.nbytes = 0
+
+
+memo = Memo()
+
+# Thread pool evaluating transforms over cache-sized chunks of the arrays.
+executor = Executor()
+
+
+def memo_stats():
+    """Hit/miss counters and size of the transform memo."""
+    return {'hits': memo.hits, 'misses': memo.misses,
+            'entries': len(memo._items), 'nbytes': memo.nbytes}
+
+
 # -------------------------------------------------------------------------------------------------
 # Router
 # -------------------------------------------------------------------------------------------------
@@ -91,6 +150,7 @@ class Renderer:
 
     def __init__(self):
         self._ids = {}
+        self._versions = {}
         self._rnd = dvz.Renderer()
         self._rst = dvz.Requester()
 
@@ -147,6 +207,7 @@ class Renderer:
         if arr.ndim == 1:
             arr = arr[:, np.newaxis]
         self._arrays[array_id] = (arr, dtype)
+        self._versions[array_id] = next(_versions)
 
     def update_array(self, cmd):
         # Update data in an array.
@@ -172,12 +233,14 @@ class Renderer:
         if data.ndim == 1:
             data = data[:, np.newaxis]
         arr[:] = data
+        self._versions[array_id] = next(_versions)
 
     # Transforms
 
     def create_transform(self, cmd):
         p = cmd.parameters
         self._transforms[cmd.id] = p
+        self._versions[cmd.id] = next(_versions)
 
     # Props
 
@@ -190,13 +253,35 @@ class Renderer:
 
     def _apply_transform(self, tr, arr):
         if tr.type == 'custom_sine':
-            arr[:, 1] = tr.amplitude * np.sin(2*np.pi*tr.frequency*(arr[:, 0]-tr.phase))
-            return arr
+            # Transform a copy: results are memoized and must not alias the source array.
+            out = arr.copy()
+
+            def sine(start, stop):
+                y = out[start:stop, 1]
+                np.subtract(out[start:stop, 0], tr.phase, out=y)
+                np.multiply(y, 2*np.pi*tr.frequency, out=y)
+                np.sin(y, out=y)
+                np.multiply(y, tr.amplitude, out=y)
+            executor.run(sine, len(out), 2 * out.itemsize)
+            return out
         elif tr.type == 'colormap':
-            arr_n = (arr - arr.min()) / (arr.max() - arr.min())
-            n = len(arr_n)
-            rgb = hsv_to_rgb(np.c_[arr_n, np.ones(n), np.ones(n)])
-            return np.c_[to_uint8(rgb), np.full(n, 255)]
+            values = arr.reshape(len(arr), -1)[:, 0]
+            n = len(values)
+            bounds = executor.run(
+                lambda start, stop: (values[start:stop].min(), values[start:stop].max()),
+                n, values.itemsize)
+            vmin, vmax = min(b[0] for b in bounds), max(b[1] for b in bounds)
+            out = np.empty((n, 4), dtype=np.uint8)
+
+            def colormap(start, stop):
+                arr_n = (values[start:stop] - vmin) / (vmax - vmin)
+                m = stop - start
+                rgb = hsv_to_rgb(np.c_[arr_n, np.ones(m), np.ones(m)])
+                out[start:stop, :3] = to_uint8(rgb)
+                out[start:stop, 3] = 255
+            # float64 temporaries: hsv and rgb stacks, normalized values and rounding
+            executor.run(colormap, n, 8 * 10)
+            return out
         else:
             return ValueError(f"unknown transform '{tr.type}'")
 
@@ -206,6 +291,22 @@ class Renderer:
             arr = self._apply_transform(tr, arr)
         return arr
 
+    def _memo_key(self, prop):
+        # The result of a prop only depends on its array and transforms, and on their versions.
+        trids = tuple(prop.transforms)
+        return (prop.array_id, self._versions[prop.array_id],
+                trids, tuple(self._versions[trid] for trid in trids))
+
+    def _get_transformed(self, prop, key):
+        arr = self._arrays[prop.array_id][0]
+        if not prop.transforms:
+            return arr
+        out = memo.get(key)
+        if out is None:
+            out = self._apply_transforms(prop.transforms, arr)
+            memo.put(key, out)
+        return out
+
     def _get_vertex(self, visual_id):
         if self._visuals[visual_id].type == 'point':
             # Return the vertex data from the props
@@ -213,16 +314,19 @@ class Renderer:
             color = self._props[visual_id, 'color']
             size = self._props[visual_id, 'size']
 
-            pos_arr = self._arrays[pos.array_id][0]
-            color_arr = self._arrays[color.array_id][0]
-            size_arr = self._arrays[size.array_id][0]
+            # Skip all the work if neither the arrays nor the transforms have changed.
+            keys = [self._memo_key(prop) for prop in (pos, color, size)]
+            vbo_key = ('vbo', visual_id, *keys)
+            vbo = memo.get(vbo_key)
+            if vbo is not None:
+                return vbo
 
             # TODO: take offset and shape into account
 
             # Apply transforms to props.
-            pos_arr = self._apply_transforms(pos.transforms, pos_arr)
-            color_arr = self._apply_transforms(color.transforms, color_arr)
-            size_arr = self._apply_transforms(size.transforms, size_arr)
+            pos_arr = self._get_transformed(pos, keys[0])
+            color_arr = self._get_transformed(color, keys[1])
+            size_arr = self._get_transformed(size, keys[2])
 
             # Create the vbo.
             n = pos_arr.shape[0]
@@ -234,6 +338,7 @@ class Renderer:
             vbo['color'] = color_arr
             vbo['size'] = size_arr
 
+            memo.put(vbo_key, vbo)
             return vbo
 
     # Drawing
@@ -305,6 +410,7 @@ if __name__ == '__main__':
 
     r = Renderer()
     img = r.run_commands(cmds)
+    executor.shutdown()
     buf = img.getvalue()
     with open('out2.png', 'wb') as f:
         f.write(buf)
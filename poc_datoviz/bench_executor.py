@@ -0,0 +1,56 @@
+# -------------------------------------------------------------------------------------------------
+# Scaling of the chunked executor with the number of threads
+# -------------------------------------------------------------------------------------------------
+#
+# Evaluates the custom_sine transform of the datoviz backend over 16M points, in a single pass and
+# with the executor using 1, 2, 4, ... threads up to the number of cores.
+
+import os
+import time
+
+import numpy as np
+
+from executor import Executor, cache_size
+
+
+def timeit(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def sine(arr, amplitude=1.0, frequency=2.0, phase=0.0):
+    def kernel(start, stop):
+        y = arr[start:stop, 1]
+        np.subtract(arr[start:stop, 0], phase, out=y)
+        np.multiply(y, 2*np.pi*frequency, out=y)
+        np.sin(y, out=y)
+        np.multiply(y, amplitude, out=y)
+    return kernel
+
+
+if __name__ == '__main__':
+    n = 16 * 1024 * 1024
+    arr = np.zeros((n, 3), dtype=np.float32)
+    arr[:, 0] = np.linspace(-1, 1, n)
+    cores = os.cpu_count() or 1
+
+    print(f"{n} points, {cores} core(s), {cache_size() // 1024} KB cache")
+    single = timeit(lambda: arr.__setitem__(
+        (slice(None), 1), np.sin(2*np.pi*2.0*(arr[:, 0]-0.0))))
+    print(f"  single pass:           {1000*single:8.1f} ms")
+
+    workers, baseline = 1, None
+    while True:
+        executor = Executor(workers)
+        elapsed = timeit(lambda: executor.run(sine(arr), n, 2 * arr.itemsize))
+        executor.shutdown()
+        baseline = baseline or elapsed
+        print(f"  chunked, {workers:2d} thread(s): {1000*elapsed:8.1f} ms"
+              f"  (speedup x{baseline/elapsed:.2f})")
+        if workers >= cores:
+            break
+        workers = min(2 * workers, cores)
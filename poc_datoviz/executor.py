@@ -0,0 +1,74 @@
+# -------------------------------------------------------------------------------------------------
+# Chunked multi-threaded evaluation of numpy kernels
+# -------------------------------------------------------------------------------------------------
+#
+# A kernel is a function kernel(start, stop) that processes the items [start, stop) of some arrays
+# and writes its results into preallocated output slices. The executor splits the items into
+# chunks that fit in the per-core (L2) cache and runs the chunks on a thread pool: numpy releases
+# the GIL in its inner loops, such that chunks run in parallel.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+# -------------------------------------------------------------------------------------------------
+# Utils
+# -------------------------------------------------------------------------------------------------
+
+def _parse_size(s):
+    s = s.strip().upper()
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    if s and s[-1] in units:
+        return int(s[:-1]) * units[s[-1]]
+    return int(s)
+
+
+def cache_size(default=1024 * 1024):
+    """Size in bytes of the largest per-core data cache (L2 usually)."""
+    size = 0
+    for index in Path('/sys/devices/system/cpu/cpu0/cache').glob('index*'):
+        try:
+            level = int((index / 'level').read_text())
+            kind = (index / 'type').read_text().strip()
+            if level <= 2 and kind in ('Data', 'Unified'):
+                size = max(size, _parse_size((index / 'size').read_text()))
+        except (OSError, ValueError):
+            continue
+    return size or default
+
+
+# -------------------------------------------------------------------------------------------------
+# Executor
+# -------------------------------------------------------------------------------------------------
+
+class Executor:
+    def __init__(self, workers=None, cache=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = cache or cache_size()
+        self._pool = None  # (created on the first multi-chunk run, closed by shutdown)
+
+    def chunk_size(self, itemsize):
+        """Number of items whose working set (itemsize bytes per item, inputs, outputs and
+        temporaries included) fits in half of the cache."""
+        return max(1024, self.cache // 2 // max(1, itemsize))
+
+    def chunks(self, n, itemsize):
+        step = self.chunk_size(itemsize)
+        return [(start, min(start + step, n)) for start in range(0, n, step)]
+
+    def run(self, kernel, n, itemsize):
+        """Call kernel(start, stop) over cache-sized chunks of [0, n) and return the results in
+        order. Small inputs (a single chunk) or a single worker run in the calling thread."""
+        chunks = self.chunks(n, itemsize)
+        if self.workers <= 1 or len(chunks) <= 1:
+            return [kernel(start, stop) for start, stop in chunks]
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.workers)
+        futures = [self._pool.submit(kernel, start, stop) for start, stop in chunks]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,50 @@
+# -------------------------------------------------------------------------------------------------
+# Chunked executor: the chunked results match the unchunked ones
+# -------------------------------------------------------------------------------------------------
+
+import numpy as np
+
+from executor import Executor
+
+
+def sine(arr, amplitude=0.5, frequency=2.0, phase=0.1):
+    def kernel(start, stop):
+        y = arr[start:stop, 1]
+        np.subtract(arr[start:stop, 0], phase, out=y)
+        np.multiply(y, 2*np.pi*frequency, out=y)
+        np.sin(y, out=y)
+        np.multiply(y, amplitude, out=y)
+    return kernel
+
+
+if __name__ == '__main__':
+    n = 100_003
+    arr = np.zeros((n, 3), dtype=np.float32)
+    arr[:, 0] = np.random.uniform(-1, 1, n)
+
+    # Unchunked reference, in a single pass
+    unchunked = arr.copy()
+    sine(unchunked)(0, n)
+
+    # Small cache: many chunks (the last one partial) over 4 threads
+    executor = Executor(4, cache=64 * 1024)
+    lazy = executor._pool is None
+    chunked = arr.copy()
+    executor.run(sine(chunked), n, 2 * chunked.itemsize)
+    count = len(executor.chunks(n, 2 * chunked.itemsize))
+    print(f"Test result: {lazy and count > 1 and np.array_equal(chunked, unchunked)}")
+
+    # Reductions are returned in chunk order
+    values = arr[:, 0]
+    bounds = executor.run(lambda start, stop: (values[start:stop].min(), values[start:stop].max()),
+                          n, values.itemsize)
+    vmin, vmax = min(b[0] for b in bounds), max(b[1] for b in bounds)
+    starts = executor.run(lambda start, stop: start, n, values.itemsize)
+    result = vmin == values.min() and vmax == values.max() and starts == sorted(starts)
+    print(f"Test result: {result}")
+
+    # A single chunk runs in the calling thread, the pool is closed by shutdown
+    single = Executor(4)
+    single.run(sine(arr[:10].copy()), 10, 8)
+    executor.shutdown()
+    print(f"Test result: {single._pool is None and executor._pool is None}")
@@ -1,2 +1,2 @@
-from ._io import load, loads, dump, dumps
+from ._io import load, loads, iterload, dump, dumps, Progress
 from ._checker import Checker, check_commands
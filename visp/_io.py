@@ -1,9 +1,12 @@
+import re
 import json
+import time
+import itertools
 import yaml
 import toml
 
 
-FORMAT_MAP = {"yml": "yaml", "jsn": "json"}
+FORMAT_MAP = {"yml": "yaml", "jsn": "json", "ndjson": "jsonl"}
 
 
 def load(file, format=None):
@@ -33,6 +36,12 @@ def loads(text, format=None):
             format = "toml"
         elif "action:" in text:
             format = "yaml"
+        elif text.lstrip().startswith("{"):
+            # A single (possibly multi-line) json object, or json lines
+            try:
+                return [json.loads(text)]
+            except ValueError:
+                format = "jsonl"
         elif '"action":' in text or "'action':" in text:
             format = "json"
         elif not text.strip():
@@ -51,10 +60,172 @@ def loads(text, format=None):
         return commands
     elif format == "json":
         return json.loads(text)
+    elif format == "jsonl":
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
     else:
         raise ValueError(f"Unknown format '{format}'")
 
 
+class Progress:
+    """Progress of an incremental load (commands, bytes and elapsed time)."""
+
+    def __init__(self):
+        self.commands = 0
+        self.bytes = 0
+        self.start = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def __repr__(self):
+        return (
+            f"{self.commands} commands, {self.bytes} bytes, "
+            f"{self.elapsed:.3f} seconds"
+        )
+
+
+def iterload(file, format=None, raw=False, progress=None, interval=1000):
+    """Read commands one at a time from a filename or file object (e.g. a pipe).
+
+    Commands are parsed and yielded as they are read such that memory use does
+    not depend on the size of the input. If raw is True, the text of each
+    command is yielded instead of the parsed command. If given, progress is
+    called with a Progress instance every interval commands and at the end.
+    """
+    if isinstance(file, str):
+        ext = file.split(".")[-1].lower()
+        with open(file, "rb") as f:
+            yield from iterload(f, format or ext, raw, progress, interval)
+        return
+    elif not hasattr(file, "readline"):
+        raise ValueError(f"Cannot read commands from a {file.__class__.__name__}")
+
+    state = Progress()
+
+    def lines():
+        for line in iter(file.readline, type(file.read(0))()):
+            state.bytes += len(line)
+            yield line.decode() if isinstance(line, bytes) else line
+
+    # Guess format from the first non empty line if format is not provided
+    lines = lines()
+    first = []
+    if not format:
+        for line in lines:
+            first.append(line)
+            if line.strip():
+                break
+        text = "".join(first).strip()
+        if text.startswith("[[command]]"):
+            format = "toml"
+        elif text.startswith("{"):
+            format = "jsonl"
+        elif text.startswith("["):
+            format = "json"
+        elif text:
+            format = "yaml"
+    lines = _chain(first, lines)
+
+    format = FORMAT_MAP.get(format, format)
+    if format == "toml":
+        chunks = _split(lines, lambda line: line.strip() == "[[command]]")
+        parse = lambda chunk: toml.loads(chunk)["command"]
+    elif format == "yaml":
+        chunks = _split(lines, _yaml_start())
+        parse = lambda chunk: yaml.load(chunk, yaml.FullLoader)
+    elif format == "jsonl":
+        chunks = (line for line in lines if line.strip())
+        parse = json.loads
+    elif format == "json":
+        chunks = _split_json(lines)
+        parse = json.loads
+    elif format:
+        raise ValueError(f"Unknown format '{format}'")
+    else:
+        chunks = ()
+
+    for chunk in chunks:
+        if raw:
+            commands = [chunk]
+        else:
+            commands = parse(chunk)
+            if commands is None:
+                continue
+            if not isinstance(commands, list):
+                commands = [commands]
+        for command in commands:
+            yield command
+            state.commands += 1
+            if progress and not state.commands % interval:
+                progress(state)
+    if progress:
+        progress(state)
+
+
+def _chain(first, lines):
+    yield from first
+    yield from lines
+
+
+def _split(lines, is_start):
+    """Group lines into chunks, a new chunk starting at each line for which
+    is_start is True."""
+    chunk = []
+    for line in lines:
+        if is_start(line) and any(item.strip() for item in chunk):
+            yield "".join(chunk)
+            chunk = []
+        chunk.append(line)
+    if any(item.strip() for item in chunk):
+        yield "".join(chunk)
+
+
+def _yaml_start():
+    """Return a function telling whether a yaml line starts a new command: a
+    document separator or, if the first document is a sequence of commands,
+    an item of this (top-level) sequence."""
+    sequence = None
+
+    def is_start(line):
+        nonlocal sequence
+        if line.startswith("---"):
+            return True
+        if sequence is None and line.strip() and not line.startswith("#"):
+            sequence = line.startswith(("- ", "-\n"))
+        return bool(sequence) and line.startswith(("- ", "-\n"))
+
+    return is_start
+
+
+_SEPARATORS = re.compile(r"[\s,\[\]]*")
+
+
+def _split_json(lines):
+    """Yield the text of each item of a json array."""
+    decoder = json.JSONDecoder()
+    buffer, start, retry = "", 0, 0
+    for line in itertools.chain(lines, [None]):
+        if line is not None:
+            buffer += line
+            # An incomplete item is decoded again once its text has doubled
+            # (or at the end), such that long items are not decoded per line
+            if len(buffer) < retry:
+                continue
+        while True:
+            start = _SEPARATORS.match(buffer, start).end()
+            try:
+                _, end = decoder.raw_decode(buffer, start)
+            except ValueError:
+                retry = 2 * len(buffer) - start
+                break
+            yield buffer[start:end]
+            start = end
+        # Drop the decoded text once it makes most of the buffer
+        if start > len(buffer) // 2:
+            buffer, retry, start = buffer[start:], retry - start, 0
+
+
 def dump(commands, file, format=None):
     """Write the commands to the given filename or file object."""
     if isinstance(file, str):
@@ -80,5 +251,7 @@ def dumps(commands, format):
         return yaml.dump_all(commands)
     elif format == "json":
         return json.dumps(commands, indent=4)
+    elif format == "jsonl":
+        return "".join(json.dumps(command) + "\n" for command in commands)
     else:
         raise ValueError(f"Unknown format '{format}'")
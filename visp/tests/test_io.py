@@ -1,8 +1,12 @@
+import io
+import json
 import os
 import tempfile
 
+import yaml
 
-from visp import load, loads, dump, dumps
+
+from visp import load, loads, iterload, dump, dumps
 
 
 ref_commands = [
@@ -98,6 +102,74 @@ def test_json():
     assert load(filename) == ref_commands
 
 
+text_jsonl = """
+{"action": "create_canvas", "id": 1, "width": 10, "height": 10}
+{"action": "create_node", "id": 2}
+"""
+
+
+def test_jsonl():
+    assert ref_commands == loads(text_jsonl)
+    assert ref_commands == loads(dumps(ref_commands, "jsonl"), "jsonl")
+
+    filename = os.path.join(tempfile.gettempdir(), "visp_io.jsonl")
+    dump(ref_commands, filename)
+    assert load(filename) == ref_commands
+
+    # A single command spanning several lines is not json lines
+    text = json.dumps(ref_commands[0], indent=2)
+    assert loads(text) == ref_commands[:1]
+
+
+def test_iterload():
+    for text in (text_toml, text_yaml1, text_yaml2, text_json, text_jsonl):
+        assert list(iterload(io.StringIO(text))) == ref_commands
+        assert list(iterload(io.BytesIO(text.encode()))) == ref_commands
+
+    for format in ("toml", "yaml", "json", "jsonl"):
+        filename = os.path.join(tempfile.gettempdir(), "visp_iter." + format)
+        dump(ref_commands, filename)
+        assert list(iterload(filename)) == ref_commands
+
+    assert list(iterload(io.StringIO(""))) == []
+
+
+def test_iterload_lists():
+    # List parameters are written at column 0 by dump
+    commands = [
+        {"action": "create_canvas", "id": 1, "size": [10, 10]},
+        {"action": "create_node", "id": 2, "items": [{"a": 1}, {"b": [2, 3]}]},
+    ]
+    for format in ("toml", "yaml", "json", "jsonl"):
+        filename = os.path.join(tempfile.gettempdir(), "visp_lists." + format)
+        dump(commands, filename)
+        assert load(filename) == commands
+        assert list(iterload(filename)) == commands
+
+    text = dumps(commands, "yaml")
+    assert len(list(iterload(io.StringIO(text), raw=True))) == 2
+    text = yaml.dump(commands)
+    assert list(iterload(io.StringIO(text))) == commands
+
+
+def test_iterload_stream():
+    # Commands are yielded before the end of the input is read
+    lines = text_jsonl.lstrip().splitlines(keepends=True)
+    file = io.StringIO("".join(lines * 1000))
+    commands = iterload(file, "jsonl")
+    assert next(commands) == ref_commands[0]
+    assert file.tell() < 2 * len(lines[0])
+
+    reports = []
+    file = io.StringIO("".join(lines * 1000))
+    commands = list(iterload(file, progress=lambda p: reports.append(p.commands)))
+    assert len(commands) == 2000
+    assert reports == [1000, 2000, 2000]
+
+    text = "\n".join(iterload(io.StringIO(text_yaml2), raw=True))
+    assert loads(text, "yaml") == ref_commands
+
+
 if __name__ == "__main__":
     for ob in list(globals().values()):
         if callable(ob) and ob.__name__.startswith("test_"):